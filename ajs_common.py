@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AJS Helper Tool - 各タブ共通の補助関数 (SFTP転送・JSON出力など)
+"""
+
+import shutil
+from ajs_constants import SFTP_WINDOW_SIZE, SFTP_READ_BLOCK_SIZE
+
+# orjson があれば JSON の読み書き (詳細ログ・ルールファイル) に使用 (無ければ標準の json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+def enlarge_sftp_window(ssh):
+    """SFTP チャネル開設前に受信ウィンドウを拡大する (以降に開くチャネルに適用される)"""
+    ssh.get_transport().default_window_size = SFTP_WINDOW_SIZE
+
+def sftp_download(sftp, remote, local):
+    """先読み(prefetch)で READ 要求をまとめて投げ、大きな単位でローカルへ書き出す"""
+    with sftp.open(remote, 'rb') as rf, open(local, 'wb') as lf:
+        rf.prefetch()
+        shutil.copyfileobj(rf, lf, SFTP_READ_BLOCK_SIZE)
+
+def json_default(o):
+    """JSON化できない型の変換 (Set型はソート済みListへ、その他は文字列へ)"""
+    if isinstance(o, (set, frozenset)):
+        return sorted(o)
+    return str(o)
@@ -34,6 +34,7 @@ IO_EXCEPTION_FILE = BASE_DIR / 'io_exceptions.json'
 CONFIG_FILE = BASE_DIR / 'config.json'
 
 MAX_HIST = 10
+RESULT_DISPLAY_MAX = 10000   # 結果テキストボックスに表示する最大行数 (超過分はログ参照)
 
 # ───────────── 出力フォルダ名定義 ─────────────
 DIR_NAME_PRINT = "ジョブ定義取得" # ★修正
@@ -45,6 +46,13 @@ DIR_NAME_DEP   = "依存関係解析"
 AJS_PRINT_PATH = "/opt/jp1ajs2/bin/ajsprint"
 AJS_DEFINE_PATH = "/opt/jp1ajs2/bin/ajsdefine"
 
+# ───────────── SFTP転送設定 ─────────────
+SFTP_WINDOW_SIZE = 2147483647   # チャネルのウィンドウサイズ (paramiko既定は2MB)
+SFTP_REKEY_BYTES = pow(2, 40)   # 転送途中の再鍵交換を抑止
+SOCK_BUF_SIZE = 32 * 1024 * 1024  # SSHソケットの送受信バッファ
+SFTP_READ_BLOCK_SIZE = 1 << 20     # ダウンロード時の読込単位
+SSH_IDLE_TIMEOUT = 300             # 使い回し中の SSH 接続をこの秒数使わなければ切断
+
 # --- JP1環境変数 デフォルト値 ---
 DEFAULT_JP1_HOSTNAME = ""
 DEFAULT_JP1_USERNAME = "jp1admin"
@@ -6,43 +6,69 @@ v3.2 (2025-11-23) - SVNAME削除, OS改行設定削除(LF固定), ログ出力
 """
 
 import time
+import codecs
 import shlex
 import traceback
 import datetime
-from ajs_constants import ENC, LOG_DIR
+from ajs_constants import ENC, LOG_DIR, SFTP_WINDOW_SIZE, SFTP_REKEY_BYTES
 
 # ログファイルパス
 LOG_FILE = LOG_DIR / "tab2_define_debug.log"
+# ジョブ実行中のみ開いておくログファイル (1行ごとの open/close を回避)
+_LOG_FH = None
 
 def _log(msg):
     """ログファイルへの書き込みヘルパー"""
     try:
-        timestamp = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] {msg}\n")
+        timestamp = time.strftime("%Y/%m/%d %H:%M:%S")
+        line = f"[{timestamp}] {msg}\n"
+        if _LOG_FH is not None:
+            _LOG_FH.write(line)
+        else:
+            with open(LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
     except: pass
 
+# ファイル読込・アップロードの単位
+_CHUNK_CHARS = 1 << 16
+
+def _validate_encoding(local_path, enc):
+    """ファイル全体を指定の文字コードで復号できるか確認する (内容は保持しない)"""
+    decoder = codecs.getincrementaldecoder(enc)()
+    with open(local_path, 'rb') as f:
+        for block in iter(lambda: f.read(_CHUNK_CHARS), b''):
+            decoder.decode(block)
+    decoder.decode(b'', final=True)
+
 def define_convert_newlines(local_path, target_enc):
     """
     ローカルの定義ファイルを読み込み、改行コードをLF(\n)に統一する。
     ※AJSの定義ファイルはUNIX/Windows問わずLFが標準的
+    ★修正: 全量を展開せず、target_enc でエンコード済みのチャンクを順に返すジェネレータを返す
+           (文字コード判定はこの関数の呼び出し時点で行い、エラーはここで送出する)
     """
-    content = None
     try:
-        with open(local_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        _validate_encoding(local_path, 'utf-8')
+        src_enc = 'utf-8'
     except UnicodeDecodeError:
         try:
-            with open(local_path, 'r', encoding='cp932') as f:
-                content = f.read()
+            _validate_encoding(local_path, 'cp932')
+            src_enc = 'cp932'
         except Exception as e:
             raise IOError(f"ファイルの読み込みに失敗しました (UTF-8, SJIS)。\n{e}")
     except Exception as e:
         raise IOError(f"ファイルを開けません。\n{e}")
     
-    # 改行コードを正規化 (\r\n -> \n, \r -> \n)
-    content = content.replace('\r\n', '\n').replace('\r', '\n')
-    return content 
+    def _iter_chunks():
+        # newline=None (ユニバーサル改行) で \r\n, \r を \n に正規化 (チャンク境界も考慮される)
+        encoder = codecs.getincrementalencoder(target_enc)()
+        with open(local_path, 'r', encoding=src_enc, newline=None) as f:
+            for text in iter(lambda: f.read(_CHUNK_CHARS), ''):
+                yield encoder.encode(text)
+        tail = encoder.encode('', final=True)
+        if tail: yield tail
+    
+    return _iter_chunks()
 
 def define_start_job(gui_vars, gui_funcs):
     """定義回復のメイン処理"""
@@ -53,9 +79,10 @@ def define_start_job(gui_vars, gui_funcs):
     show_info = gui_funcs['show_info']
     show_error = gui_funcs['show_error']
     
-    # ログ開始
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        f.write(f"=== Tab 2 (Define) Execution Start: {datetime.datetime.now()} ===\n")
+    global _LOG_FH
+    # ログ開始 (★修正: ジョブ終了までファイルを開いたままバッファ書き込み)
+    _LOG_FH = open(LOG_FILE, "w", encoding="utf-8", buffering=1 << 16)
+    _LOG_FH.write(f"=== Tab 2 (Define) Execution Start: {datetime.datetime.now()} ===\n")
 
     try:
         # --- パラメータ取得 ---
@@ -91,19 +118,30 @@ def define_start_job(gui_vars, gui_funcs):
         target_enc = ENC[v_srv_c.get()]
         
         update_status("ファイル変換中...", 20)
-        # 改行コードはLF固定
-        converted_content = define_convert_newlines(local_path, target_enc)
-        _log("[Info] File read and converted to LF.")
+        # 改行コードはLF固定 (変換はアップロードしながら逐次行う)
+        converted_chunks = define_convert_newlines(local_path, target_enc)
+        _log("[Info] File opened for streaming conversion to LF.")
         
         update_status("SSH 接続...", 30)
         with get_ssh_client() as ssh:
-            sftp = ssh.open_sftp()
+            # ★追加: 転送ウィンドウ拡大 & 再鍵交換抑止 (チャネル開設前に設定)
+            transport = ssh.get_transport()
+            transport.default_window_size = SFTP_WINDOW_SIZE
+            transport.packetizer.REKEY_BYTES = SFTP_REKEY_BYTES
             remote_path = f"/tmp/define_{time.strftime('%Y%m%d%H%M%S')}.txt"
             
             update_status("ファイルアップロード中...", 50)
             _log(f"[Info] Uploading to {remote_path}...")
-            with sftp.open(remote_path, 'wb') as f:
-                f.write(converted_content.encode(target_enc))
+            # ★修正: SFTPではなく exec チャネルの標準入力 (cat >) へ変換済みチャンクを逐次送信
+            ch_up = transport.open_session()
+            ch_up.exec_command(f"cat > {shlex.quote(remote_path)}")
+            for chunk in converted_chunks:
+                ch_up.sendall(chunk)
+            ch_up.shutdown_write()
+            if ch_up.recv_exit_status() != 0:
+                err_msg = ch_up.makefile_stderr().read().decode(target_enc, 'ignore')
+                _log(f"[Error] Upload failed: {err_msg}")
+                raise RuntimeError(f"ファイルアップロードエラー:\n{err_msg}")
             
             update_status("ajsdefine 実行中...", 70)
             # コマンド構築
@@ -119,8 +157,8 @@ def define_start_job(gui_vars, gui_funcs):
                 _log(f"[Error] Command failed: {err_msg}")
                 raise RuntimeError(f"ajsdefine 実行エラー:\n{err_msg}")
             
-            sftp.remove(remote_path)
-            sftp.close()
+            _, stdout, _ = ssh.exec_command(f"rm -f {shlex.quote(remote_path)}")
+            stdout.channel.recv_exit_status()
             
         update_status("完了", 100)
         save_hist()
@@ -134,3 +172,5 @@ def define_start_job(gui_vars, gui_funcs):
         show_error(err_detail)
     finally:
         update_status("待機中", 0)
+        _LOG_FH.close()
+        _LOG_FH = None
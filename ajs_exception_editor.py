@@ -5,93 +5,72 @@ AJS Helper Tool - I/O 手動ルール エディタ
 v1.5 (2025-11-12) - ソートを大文字/小文字 区別しないように修正
 """
 
+import os
 import json
+import hashlib
+import itertools
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import copy
+import bisect
 
 # 定数ファイルをインポート
 from ajs_constants import IO_EXCEPTION_FILE
+from ajs_common import ORJSON_AVAILABLE, orjson
+
+def _loads(data):
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+def _dumps(obj):
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
 
 # -----------------------------------------------------------------------------
-# ★ 汎用「リスト編集」ウィジェット (変更なし)
+# ★ 汎用「リスト編集」ウィジェット (★ 修正)
 # -----------------------------------------------------------------------------
 class ListEditor(ttk.Frame):
     """
-    「行追加」「行削除」機能を持つリスト入力ウィジェット
+    リスト入力ウィジェット (1行 = 1件)
+    ★修正: 行ごとの Frame/Entry/Button をやめ、1つの Text で編集する
     """
     def __init__(self, parent, title, initial_list=None):
         super().__init__(parent)
         
-        self.label = ttk.Label(self, text=title)
+        self.label = ttk.Label(self, text=f"{title}  ※1行に1件")
         self.label.pack(fill="x", padx=5)
         
-        self.canvas_frm = ttk.Frame(self, relief="solid", borderwidth=1)
-        self.canvas_frm.pack(fill="both", expand=True, padx=5, pady=(2, 5))
+        text_frm = ttk.Frame(self, relief="solid", borderwidth=1)
+        text_frm.pack(fill="both", expand=True, padx=5, pady=(2, 5))
         
-        self.canvas = tk.Canvas(self.canvas_frm, borderwidth=0, background="#ffffff", height=100)
-        self.scroll_frame = ttk.Frame(self.canvas, padding=(5, 5)) 
-        self.vsb = ttk.Scrollbar(self.canvas_frm, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.vsb.set)
-
+        self.text = tk.Text(text_frm, height=8, wrap="none", borderwidth=0, undo=True)
+        self.vsb = ttk.Scrollbar(text_frm, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=self.vsb.set)
         self.vsb.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.canvas_window_id = self.canvas.create_window((0, 0), window=self.scroll_frame, anchor="nw")
-
-        self.scroll_frame.bind("<Configure>", self._on_frame_configure)
-        self.canvas.bind("<Configure>", self._on_canvas_configure)
-
-        self.all_rows = [] 
+        self.text.pack(side="left", fill="both", expand=True)
         
-        btn_frame = ttk.Frame(self)
-        btn_frame.pack(fill="x", padx=5)
-        ttk.Button(btn_frame, text="行を追加", command=self.add_row).pack(side="left")
-
         if initial_list:
-            for item in initial_list:
-                self.add_row(item)
-        else:
-            self.add_row("") 
+            self.text.insert("1.0", "\n".join(initial_list))
 
-    def _on_frame_configure(self, event):
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        
-    def _on_canvas_configure(self, event):
-        self.canvas.itemconfig(self.canvas_window_id, width=event.width)
+        # Enter は改行として扱う (ダイアログの <Return>=OK を発火させないよう toplevel のタグを外す)
+        self.text.bindtags((str(self.text), "Text", "all"))
+        # ホイールは Text 自身で処理し "break" で止める (メイン画面側の bind_all へ伝播させない)
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.text.bind(seq, self._on_mouse_wheel)
 
     def _on_mouse_wheel(self, event):
-        if hasattr(event, 'delta'):
-             self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-        elif event.num == 5:
-             self.canvas.yview_scroll(1, "units")
+        if event.num == 5:
+             self.text.yview_scroll(1, "units")
         elif event.num == 4:
-             self.canvas.yview_scroll(-1, "units")
-
-    def add_row(self, value=""):
-        row_f = ttk.Frame(self.scroll_frame)
-        row_f.pack(fill="x", pady=1)
-        entry = ttk.Entry(row_f)
-        entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
-        entry.insert(0, value)
-        del_btn = ttk.Button(row_f, text="削除", width=5, command=lambda f=row_f: self.remove_row(f))
-        del_btn.pack(side="left")
-        self.all_rows.append((row_f, entry))
-
-    def remove_row(self, frame_to_remove):
-        for i, (f, entry) in enumerate(self.all_rows):
-            if f == frame_to_remove:
-                f.destroy()
-                self.all_rows.pop(i)
-                break
+             self.text.yview_scroll(-1, "units")
+        elif event.delta:
+             self.text.yview_scroll(int(-1 * (event.delta / 120)), "units")
+        return "break"
 
     def get_values(self):
-        return [entry.get() for f, entry in self.all_rows if entry.get().strip()]
-
-    def bind_mousewheel(self):
-        self.canvas.bind_all("<MouseWheel>", self._on_mouse_wheel)
-
-    def unbind_mousewheel(self):
-        self.canvas.unbind_all("<MouseWheel>")
+        # Text 全体を1回だけ取得し、前後の空白を除いた空でない行を返す
+        return [v for ln in self.text.get("1.0", "end-1c").splitlines() if (v := ln.strip())]
 
 # -----------------------------------------------------------------------------
 # ★ ルール編集ポップアップ (変更なし)
@@ -156,9 +135,6 @@ class RuleEditDialog:
         self.win.protocol("WM_DELETE_WINDOW", self.on_cancel)
         self.win.bind("<Return>", lambda e: self.on_ok())
         self.win.bind("<Escape>", lambda e: self.on_cancel())
-        
-        self.inputs_editor.bind_mousewheel()
-        self.outputs_editor.bind_mousewheel()
 
     def on_ok(self):
         shell = self.shell_var.get()
@@ -175,13 +151,9 @@ class RuleEditDialog:
             "source_tag": self.tag_var.get()
         }
         
-        self.inputs_editor.unbind_mousewheel()
-        self.outputs_editor.unbind_mousewheel()
         self.win.destroy()
 
     def on_cancel(self):
-        self.inputs_editor.unbind_mousewheel()
-        self.outputs_editor.unbind_mousewheel()
         self.win.destroy()
 
     def show(self):
@@ -199,7 +171,22 @@ class ExceptionEditor:
         self.parent = parent
         self.banks = banks
         self.all_rules = self.load_rules() 
-        self.is_dirty = False 
+        # ★追加: 銀行ごとのルール一覧 (タブ表示・追加・削除はこちらを参照)
+        self.rules_by_bank = {b: [] for b in self.banks}
+        for rule in self.all_rules:
+            self.rules_by_bank.setdefault(rule.get("bank"), []).append(rule)
+        # ★追加: ソートキーは読込時に1回だけ計算し (JSONに出さないよう id で別管理)、各銀行の一覧をソート済みで保持
+        self._keys = {id(r): self._compute_key(r) for r in self.all_rules}
+        for bank_rules in self.rules_by_bank.values():
+            bank_rules.sort(key=self._sort_key)
+        # ★追加: 入力/出力の概要文字列 (id(rule) -> (inputs, outputs))。初回表示時に作成し、変更・削除時に破棄
+        self._summaries = {}
+        # ★追加: Treeview の iid -> ルール (全タブ共通)。iid は連番で払い出す
+        self._next_iid = itertools.count()
+        self._rule_by_iid = {}
+        # ★修正: 変更有無は変更回数と保存時点の回数の比較で判定
+        self._mutation_counter = 0
+        self._saved_counter = 0
         
         self.win = tk.Toplevel(parent)
         self.win.title("I/O 手動ルール エディタ (io_exceptions.json)")
@@ -214,10 +201,12 @@ class ExceptionEditor:
         self.notebook.pack(fill="both", expand=True, pady=5)
         
         self.bank_tabs = {} 
+        self._tab_bank = {}  # タブ(フレーム名) -> 銀行
         for bank in self.banks:
             self.create_bank_tab(bank)
             
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_change)
+        self.on_tab_change(None)  # 最初に表示されるタブを読み込む
         
         close_btn_frame = ttk.Frame(main_frame)
         close_btn_frame.pack(fill="x", pady=(10, 0))
@@ -227,13 +216,19 @@ class ExceptionEditor:
         
         self.win.protocol("WM_DELETE_WINDOW", self.on_close_window) 
 
+    @property
+    def is_dirty(self):
+        return self._mutation_counter != self._saved_counter
+
     def load_rules(self):
+        self._last_saved_hash = None  # ファイル内容のハッシュ (変更が無ければ保存をスキップ)
         if not IO_EXCEPTION_FILE.exists():
             return []
         try:
-            with open(IO_EXCEPTION_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get("rules", [])
+            raw = IO_EXCEPTION_FILE.read_bytes()
+            self._last_saved_hash = hashlib.blake2b(raw, digest_size=8).digest()
+            data = _loads(raw)
+            return data.get("rules", [])
         except Exception as e:
             messagebox.showerror("読込エラー", f"{IO_EXCEPTION_FILE.name} の読み込みに失敗しました。\n{e}", parent=self.win)
             return []
@@ -242,14 +237,22 @@ class ExceptionEditor:
         """
         現在の all_rules をソートしてJSONファイルに書き戻す
         """
-        # ★★★ 修正点 1 (Sort) ★★★
-        # .lower() を使って大文字/小文字を区別せずにソート
-        self.all_rules.sort(key=lambda r: (r.get("bank", "").lower(), r.get("shell", "").lower()))
+        # 銀行ごとの一覧を1つのリストに戻す (タブの無い銀行のルールも保持)
+        # ★修正: 各銀行の一覧はソート済みのため、銀行名順に連結するだけ (大文字/小文字は区別しない)
+        self.all_rules = [r for b in sorted(self.rules_by_bank, key=lambda b: (b or "").lower())
+                          for r in self.rules_by_bank[b]]
         
         try:
-            with open(IO_EXCEPTION_FILE, 'w', encoding='utf-8') as f:
-                json.dump({"rules": self.all_rules}, f, indent=2, ensure_ascii=False)
-            self.is_dirty = False 
+            payload = _dumps({"rules": self.all_rules})
+            digest = hashlib.blake2b(payload, digest_size=8).digest()
+            # ★追加: 内容が変わっていなければ書き込まない
+            if digest != self._last_saved_hash:
+                # ★追加: 一時ファイルに書いてから置き換え (書き込み途中の破損を防ぐ)
+                tmp = IO_EXCEPTION_FILE.with_suffix(".json.tmp")
+                tmp.write_bytes(payload)
+                os.replace(tmp, IO_EXCEPTION_FILE)
+                self._last_saved_hash = digest
+            self._saved_counter = self._mutation_counter
             return True
         except Exception as e:
             messagebox.showerror("保存エラー", f"{IO_EXCEPTION_FILE.name} への保存に失敗しました。\n{e}", parent=self.win)
@@ -259,6 +262,7 @@ class ExceptionEditor:
         """銀行ごとのタブUIを作成する"""
         tab_frame = ttk.Frame(self.notebook, padding=10)
         self.notebook.add(tab_frame, text=bank)
+        self._tab_bank[str(tab_frame)] = bank
         
         # 1. ルール一覧 (Treeview)
         tree_frame = ttk.Frame(tab_frame)
@@ -299,35 +303,66 @@ class ExceptionEditor:
         
         self.bank_tabs[bank] = {
             "tree": tree,
-            "item_map": {} 
+            "populated": False  # ★追加: ルール一覧は初めてタブを開いた時に読み込む
         }
         
         tree.bind("<Double-1>", lambda e, b=bank: self.modify_rule(b))
-        
-        self.load_rules_for_bank(bank)
 
     def load_rules_for_bank(self, bank):
         """Treeview に指定された銀行のルールを読み込む"""
         widgets = self.bank_tabs[bank]
         tree = widgets["tree"]
         
-        tree.delete(*tree.get_children())
-        widgets["item_map"].clear()
+        rule_by_iid = self._rule_by_iid
+        children = tree.get_children()
+        tree.delete(*children)
+        for iid in children:
+            rule_by_iid.pop(iid, None)
             
-        bank_rules = [r for r in self.all_rules if r.get("bank") == bank]
-        # ★★★ 修正点 1 (Sort) ★★★
-        # .lower() を使って大文字/小文字を区別せずにソート
-        bank_rules.sort(key=lambda r: r.get("shell", "").lower())
-        
-        for rule in bank_rules:
-            inputs_str = ", ".join(rule.get("inputs", []))
-            outputs_str = ", ".join(rule.get("outputs", []))
-            values = (
-                rule.get("shell", ""), rule.get("unit", ""),
-                inputs_str, outputs_str, rule.get("source_tag", "")
-            )
-            item_id = tree.insert("", "end", values=values)
-            widgets["item_map"][item_id] = rule
+        # ★修正: 挿入中はレイアウト計算させないよう一旦 pack を外す
+        ins = tree.insert
+        next_iid = self._next_iid
+        tree.pack_forget()
+        try:
+            # 銀行ごとの一覧はソート済み (大文字/小文字を区別しない)
+            for rule in self.rules_by_bank.get(bank, []):
+                rule_by_iid[ins("", "end", iid=f"r{next(next_iid)}", values=self._rule_values(rule))] = rule
+        finally:
+            tree.pack(side="left", fill="both", expand=True)
+
+    def _compute_summary(self, rule):
+        return ", ".join(rule.get("inputs", ())), ", ".join(rule.get("outputs", ()))
+
+    def _rule_values(self, rule):
+        """Treeview 1行分の表示値"""
+        summary = self._summaries.get(id(rule))
+        if summary is None:
+            summary = self._summaries[id(rule)] = self._compute_summary(rule)
+        get = rule.get
+        return (get("shell", ""), get("unit", ""), summary[0], summary[1], get("source_tag", ""))
+
+    def _compute_key(self, rule):
+        """ソートキー (銀行内でシェル名順、大文字/小文字は区別しない)"""
+        return rule.get("shell", "").lower()
+
+    def _sort_key(self, rule):
+        return self._keys[id(rule)]
+
+    def _insert_rule_row(self, bank, idx, rule):
+        """一覧の idx 番目に1行だけ挿入する (全行の再読み込みはしない)"""
+        tree = self.bank_tabs[bank]["tree"]
+        item_id = tree.insert("", idx, iid=f"r{next(self._next_iid)}", values=self._rule_values(rule))
+        self._rule_by_iid[item_id] = rule
+        return item_id
+
+    def _update_rule_row(self, bank, item_id, idx, rule):
+        """既存行の表示値を更新し、一覧の idx 番目へ移動する"""
+        tree = self.bank_tabs[bank]["tree"]
+        tree.item(item_id, values=self._rule_values(rule))
+        # 切り離してから移動 (idx は自身を除いた並びでの位置)
+        tree.detach(item_id)
+        tree.move(item_id, "", idx)
+        self._rule_by_iid[item_id] = rule
 
     def add_rule(self, bank):
         """「ルールの追加...」ボタン"""
@@ -335,10 +370,14 @@ class ExceptionEditor:
         new_rule = dialog.show()
         
         if new_rule:
-            self.all_rules.append(new_rule)
-            self.is_dirty = True
-            # Treeview を再読み込み (ソートを反映させるため)
-            self.load_rules_for_bank(bank)
+            key = self._compute_key(new_rule)
+            self._keys[id(new_rule)] = key
+            bank_rules = self.rules_by_bank[bank]
+            idx = bisect.bisect_right(bank_rules, key, key=self._sort_key)
+            bank_rules.insert(idx, new_rule)
+            self._mutation_counter += 1
+            # ★修正: 全件再読み込みせず、ソート位置に1行だけ追加
+            self._insert_rule_row(bank, idx, new_rule)
 
     def modify_rule(self, bank):
         """「選択したルールを変更...」ボタン"""
@@ -352,23 +391,36 @@ class ExceptionEditor:
         
         item_id = selected_item[0]
         
-        old_rule = widgets["item_map"].get(item_id)
+        old_rule = self._rule_by_iid.get(item_id)
         if not old_rule:
             messagebox.showerror("内部エラー", "選択されたルールの参照が見つかりません。", parent=self.win)
             return
 
-        dialog = RuleEditDialog(self.win, bank, copy.deepcopy(old_rule))
+        # ダイアログは rule_data を読むだけ (OK時は新しい dict を生成) のため、コピーせずに渡す
+        dialog = RuleEditDialog(self.win, bank, old_rule)
         updated_rule = dialog.show()
         
-        if updated_rule:
-            for i, rule in enumerate(self.all_rules):
-                if rule == old_rule:
-                    self.all_rules[i] = updated_rule
-                    break
+        # 内容が変わっていなければ何もしない (未保存扱いにしない)
+        if updated_rule and updated_rule != old_rule:
+            bank_rules = self.rules_by_bank[bank]
+            # 一覧とTreeviewは同じ並び順のため、行位置がそのまま一覧上の位置
+            i = tree.index(item_id)
+            old_key = self._keys.pop(id(old_rule))
+            self._summaries.pop(id(old_rule), None)
+            new_key = self._compute_key(updated_rule)
+            self._keys[id(updated_rule)] = new_key
+            if new_key == old_key:
+                bank_rules[i] = updated_rule
+                idx = i
+            else:
+                # キーが変わった場合のみ取り出して再挿入
+                bank_rules.pop(i)
+                idx = bisect.bisect_right(bank_rules, new_key, key=self._sort_key)
+                bank_rules.insert(idx, updated_rule)
             
-            self.is_dirty = True
-            # Treeview を再読み込み (ソートを反映させるため)
-            self.load_rules_for_bank(bank) 
+            self._mutation_counter += 1
+            # ★修正: 全件再読み込みせず、該当行のみ更新・移動
+            self._update_rule_row(bank, item_id, idx, updated_rule)
 
 
     def delete_rule(self, bank):
@@ -384,23 +436,26 @@ class ExceptionEditor:
         # 確認メッセージ
         msg = f"{len(selected_items)} 件のルールを削除しますか？\n(保存するまでファイルには反映されません)"
         if len(selected_items) == 1:
-            rule_to_delete = widgets["item_map"].get(selected_items[0])
+            rule_to_delete = self._rule_by_iid.get(selected_items[0])
             msg = f"以下のルールを削除しますか？\nシェル: {rule_to_delete.get('shell')}\nユニット: {rule_to_delete.get('unit')}"
 
         if messagebox.askyesno("確認", msg, parent=self.win):
-            
+            # ★修正: 削除対象をまとめて集め、Treeview・一覧ともに1回で削除
+            drop_ids = set()
             for item_id in selected_items:
-                rule_to_delete = widgets["item_map"].get(item_id)
-                if not rule_to_delete:
-                    continue 
-
-                if rule_to_delete in self.all_rules:
-                    self.all_rules.remove(rule_to_delete)
-                
-                tree.delete(item_id)
-                del widgets["item_map"][item_id] 
+                rule_to_delete = self._rule_by_iid.pop(item_id, None)
+                if rule_to_delete is None:
+                    continue
+                drop_ids.add(id(rule_to_delete))
+            
+            tree.delete(*selected_items)
+            # id で判定 (同内容の別ルールを誤って消さない)
+            self.rules_by_bank[bank] = [r for r in self.rules_by_bank[bank] if id(r) not in drop_ids]
+            for rid in drop_ids:
+                self._keys.pop(rid, None)
+                self._summaries.pop(rid, None)
             
-            self.is_dirty = True
+            self._mutation_counter += 1
 
     def check_dirty_and_save(self):
         """
@@ -419,11 +474,17 @@ class ExceptionEditor:
         if answer is None: return False
         elif answer is True: return self.save_rules()
         else:
-            self.is_dirty = False
+            self._saved_counter = self._mutation_counter  # 変更を破棄
             return True
 
     def on_tab_change(self, event):
-        pass
+        """表示されたタブのルール一覧を未読込なら読み込む"""
+        bank = self._tab_bank.get(self.notebook.select())
+        if bank is None: return
+        widgets = self.bank_tabs[bank]
+        if not widgets["populated"]:
+            self.load_rules_for_bank(bank)
+            widgets["populated"] = True
 
     def on_save_and_close(self):
         """「保存して閉じる」ボタン"""
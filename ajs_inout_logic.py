@@ -9,14 +9,18 @@ import re
 import os
 import sys
 import time
-import glob
 import codecs
 import shlex
 import csv
 import json
 import pathlib
 import itertools
-import copy
+import collections
+import pickle
+import mmap
+import atexit
+import concurrent.futures
+import contextlib
 import traceback
 import datetime
 from fnmatch import fnmatch
@@ -25,17 +29,44 @@ from fnmatch import fnmatch
 try:
     import openpyxl
     from openpyxl.styles import Alignment, PatternFill
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
     OPENPYXL_AVAILABLE = True
 except ImportError:
     OPENPYXL_AVAILABLE = False
 
 # 定数ファイルをインポート
-from ajs_constants import LOG_DIR, IO_EXCEPTION_FILE, CONFIG_FILE, DIR_NAME_INOUT
+from ajs_constants import LOG_DIR, IO_EXCEPTION_FILE, CONFIG_FILE, DIR_NAME_INOUT, RESULT_DISPLAY_MAX
+from ajs_common import ORJSON_AVAILABLE, orjson, json_default
 
 # --- グローバル変数: 解析結果のキャッシュ ---
-_ANALYSIS_CACHE = {}
+_ANALYSIS_CACHE = {}  # 挿入順 = 利用順 (先頭が最も古い)
+_ANALYSIS_CACHE_MAX = 8  # 1件ごとに詳細ログ全体を保持するため件数を制限
 _LAST_CACHE_KEY = None
 
+# ajsprint 出力1行分のレコード (★修正: 1行ごとの dict 生成をやめ、位置アクセスの namedtuple 化)
+AjsRecord = collections.namedtuple('AjsRecord', 'unit_full unit resource type env param')
+_AJS_EMPTY_FIELDS = ('',) * len(AjsRecord._fields)
+
+class AjsTable:
+    """
+    解析結果を列ごとのリストで保持するテーブル (SoA)
+    ★追加: 行ごとの dict をやめ、後続の各処理は必要な列だけを zip で走査する
+    """
+    COLUMNS = AjsRecord._fields + ('inputs', 'outputs', 'source_tag')
+    __slots__ = COLUMNS
+
+    def __init__(self, records):
+        cols = list(zip(*records)) if records else [()] * len(AjsRecord._fields)
+        for name, col in zip(AjsRecord._fields, cols): setattr(self, name, list(col))
+        self.inputs, self.outputs, self.source_tag = [], [], []
+
+    def __len__(self): return len(self.unit_full)
+
+    def to_dicts(self):
+        """詳細ログ出力用に行ごとの dict へ戻す"""
+        return [dict(zip(self.COLUMNS, row)) for row in zip(*(getattr(self, c) for c in self.COLUMNS))]
+
 # ログファイルパス
 LOG_FILE_RUN = LOG_DIR / "tab3_inout_run.log"
 LOG_FILE_DETAIL = LOG_DIR / "tab3_inout_details.json"
@@ -43,7 +74,7 @@ LOG_FILE_DETAIL = LOG_DIR / "tab3_inout_details.json"
 def _log(msg):
     """実行ログへの書き込みヘルパー"""
     try:
-        timestamp = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+        timestamp = time.strftime("%Y/%m/%d %H:%M:%S")
         with open(LOG_FILE_RUN, "a", encoding="utf-8") as f:
             f.write(f"[{timestamp}] {msg}\n")
     except: pass
@@ -56,6 +87,18 @@ ALL_VAR_PAT = re.compile(r"\$(\{([^}]+)\}|([a-zA-Z_][a-zA-Z0-9_]*)|(\d+))")
 CASE_VAR_PAT = re.compile(r'case\s*["\']?\$(\{([^}]+)\}|([a-zA-Z_][a-zA-Z0-9_]*))["\']?')
 VAR_ASSIGN_PAT = re.compile(r'^\s*(?:export\s+)?([^=\s]+)\s*=\s*(' r'[\'"](.*?)[\'"]|' r'(?:[^ \t;#]+)' r')')
 RM_PAT = re.compile(r'^\s*rm\s+(?:-f\s+)?(.*)')
+IF_PAT = re.compile(r'if\s*\[\s*"\$\{([^}]+)\}"\s*=\s*"([^"]+)"\s*\]')
+PATTERN_LINE_PAT = re.compile(r'^\s*([^)\s]+)\s*\)')
+# シェル1行を rm / I/O定義 / 変数代入 の順に1回で判定する (グループ番号は各パターンの番号 + オフセット)
+SHELL_LINE_PAT = re.compile(
+    r'(?P<rm>' + RM_PAT.pattern[1:] + r')|'
+    r'(?P<res>' + RES_PAT.pattern[1:] + r')|'
+    r'(?P<assign>' + VAR_ASSIGN_PAT.pattern[1:] + r')')
+_RM_G = SHELL_LINE_PAT.groupindex['rm']
+_RES_G = SHELL_LINE_PAT.groupindex['res']
+_ASSIGN_G = SHELL_LINE_PAT.groupindex['assign']
+PM_PAT = re.compile(r"\$\{PM\[(\d+)\]\}")
+EN_PAT = re.compile(r"\$\{EN\[([^}]+)\]\}")
 
 # -----------------------------------------------------------------------------
 # ★ ヘルパー関数 & クラス
@@ -66,6 +109,25 @@ def _create_replacer(var_dict):
         return var_dict.get(key, match.group(0)) if key else match.group(0)
     return replacer
 
+def _iter_var_keys(value):
+    """文字列中の $変数参照の変数名を順に返す (ALL_VAR_PAT の1回の走査)"""
+    for m in ALL_VAR_PAT.finditer(value):
+        yield m.group(2) or m.group(3) or m.group(4)
+
+def _tokenize_template(template):
+    """
+    $変数を含む値テンプレートを、リテラル(str) と 変数参照(変数名, 元の表記) の並びへ分解する
+    ($ を含まない場合は文字列のまま返す)
+    """
+    if not template or "$" not in template: return template
+    parts, pos = [], 0
+    for m in ALL_VAR_PAT.finditer(template):
+        if m.start() > pos: parts.append(template[pos:m.start()])
+        parts.append((m.group(2) or m.group(3) or m.group(4), m.group(0)))
+        pos = m.end()
+    if pos < len(template): parts.append(template[pos:])
+    return tuple(parts)
+
 class ComenvParser:
     def __init__(self, comenv_path, initial_vars, log_data):
         self.comenv_path = comenv_path
@@ -75,31 +137,39 @@ class ComenvParser:
         self.case_patterns = {} 
         self.master_var_dict = {} 
         self.case_vars_order = [] 
+        self._token_cache = {}  # 値テンプレート -> _tokenize_template の結果 (全組み合わせで共有)
 
     def _read_comenv(self):
         if not self.comenv_path: return []
         try:
-            with codecs.open(self.comenv_path, "r", "cp932", errors="ignore") as f:
-                return f.readlines()
+            # ★修正: mmap 上で行を切り出し、空行・コメント行はデコードせずバイト列のまま除外
+            #        (cp932 の2バイト目に改行コードは現れないため、行単位のデコードで問題ない)
+            lines = []
+            with open(self.comenv_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0: return lines  # 空ファイルは mmap 不可
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for raw in iter(mm.readline, b""):
+                        head = raw.lstrip()
+                        if not head or head[:1] == b"#": continue
+                        lines.append(raw.decode("cp932", "ignore"))
+            return lines
         except Exception as e:
             _log(f"[Warning] comenv read error: {e}")
             return []
 
     def _resolve_value(self, value, current_vars):
         if "$" not in value: return value
-        replacer_func = _create_replacer(current_vars)
+        # ★修正: 正規表現置換の代わりに、分解済みテンプレート (値ごとにキャッシュ) の展開を不動点まで繰り返す
+        token_cache = self._token_cache
         for _ in range(10): 
-            new_value = ALL_VAR_PAT.sub(replacer_func, value)
+            tokens = token_cache.get(value)
+            if tokens is None: tokens = token_cache[value] = _tokenize_template(value)
+            if tokens.__class__ is str: return value
+            new_value = ''.join(p if p.__class__ is str else current_vars.get(p[0], p[1]) for p in tokens)
             if new_value == value: return new_value 
             value = new_value
         return value
 
-    def _evaluate_if_statement(self, line, current_vars):
-        match = re.search(r'if\s*\[\s*"\$\{([^}]+)\}"\s*=\s*"([^"]+)"\s*\]', line)
-        if match:
-            return current_vars.get(match.group(1), "") == match.group(2)
-        return True
-
     def parse_all_patterns(self):
         if not self.lines: return
         
@@ -116,13 +186,19 @@ class ComenvParser:
                             self.case_vars_order.append(current_case_var)
                         self.case_patterns.setdefault(current_case_var, set())
             elif current_case_var:
-                match = re.match(r'^\s*([^)\s]+)\s*\)', line_stripped)
+                match = PATTERN_LINE_PAT.match(line_stripped)
                 if match:
                     pattern = match.group(1).strip()
                     if pattern != "*": self.case_patterns[current_case_var].add(pattern)
             elif line_stripped.startswith("esac"):
                 current_case_var = None
         
+        # ★修正: comenv は1回だけ中間表現へ変換し、組み合わせごとはその実行のみ行う
+        ir = self._compile_ir()
+        # ★追加: case ブロック内に代入文が無い変数はパターンで結果が変わらないため組み合わせから除外
+        used_case_vars = self._case_vars_with_assignments(ir)
+        self.case_vars_order = [v for v in self.case_vars_order if v in used_case_vars]
+        
         # パターン組み合わせ生成
         pattern_lists = []
         for var_name in self.case_vars_order:
@@ -135,71 +211,127 @@ class ComenvParser:
             self.case_vars_order = ["_default_"] 
             
         self.log_data["comenv_case_patterns"] = self.case_patterns
-        all_combinations = list(itertools.product(*pattern_lists))
+        # ★修正: 組み合わせはリスト化せず逐次生成し、結果が同一の変数辞書は1つを共有する
+        seen_results = {}
         
-        for combination in all_combinations:
-            current_pattern_map = dict(zip(self.case_vars_order, combination)) 
-            current_vars = self.initial_vars.copy()
-            active_block = True      
-            case_active = False    
-            current_case_var = None    
-            case_match_found = False   
-            
-            for line in self.lines:
-                line_stripped = line.strip()
-                if not line_stripped or line_stripped.startswith("#"): continue
-                if line_stripped.startswith("if"):
-                    active_block = self._evaluate_if_statement(line_stripped, current_vars)
-                    continue
-                elif line_stripped.startswith("else"):
-                    active_block = not active_block
-                    continue
-                elif line_stripped.startswith("fi"):
-                    active_block = True
-                    continue
-
-                if line_stripped.startswith("case"):
-                    match = CASE_VAR_PAT.search(line_stripped)
-                    if match:
-                        current_case_var = match.group(2) or match.group(3)
-                        case_match_found = False
-                        case_active = True 
-                    continue
-                elif line_stripped.startswith("esac"):
-                    current_case_var = None
-                    case_match_found = False
-                    case_active = False
-                    active_block = True 
-                    continue
-                
-                is_pattern_line = False
+        # ★修正: 中間表現を組み合わせ1件分を評価する関数へ変換し、組み合わせごとにはその関数を呼ぶだけにする
+        run_combination = self._build_combination_func(ir)
+        for combination in itertools.product(*pattern_lists):
+            current_vars = run_combination(combination, self.initial_vars, self._resolve_value)
+            try:
+                current_vars = seen_results.setdefault(frozenset(current_vars.items()), current_vars)
+            except TypeError: pass  # 値がハッシュ不可 (設定ファイル由来) の場合は共有しない
+            self.master_var_dict[combination] = current_vars
+
+    def _build_combination_func(self, ir):
+        """
+        中間表現から「パターンの組み合わせ -> 変数辞書」を求める Python 関数のソースを生成してコンパイルする
+        case ブロック内か・どの case 変数か は行の位置で決まるため生成時に確定させ、
+        実行時に変わる状態 (有効ブロック・パターン一致済み) だけをローカル変数で持つ
+        """
+        var_index = {v: i for i, v in enumerate(self.case_vars_order)}
+        src = ["def _run(combo, initial, resolve):",
+               "    v = initial.copy()",
+               "    active = True",
+               "    found = False"]
+        emit = src.append
+        case_active, case_var = False, None
+        for op in ir:
+            kind = op[0]
+            if kind == "LINE":
+                _, pattern, is_dsemi, assign_plain, assign_pat = op
+                assign = assign_plain
                 if case_active:
-                    match = re.match(r'^\s*([^)\s]+)\s*\)', line_stripped)
-                    if match:
-                        is_pattern_line = True
-                        pattern = match.group(1).strip()
-                        target_pattern = current_pattern_map.get(current_case_var, "*")
-                        if not case_match_found and (pattern == target_pattern or pattern == "*"):
-                            active_block = True
-                            case_match_found = True 
+                    if pattern is not None:
+                        assign = assign_pat
+                        i = var_index.get(case_var)
+                        if pattern == "*": cond = "not found"
+                        elif i is not None: cond = f"not found and combo[{i}] == {pattern!r}"
+                        else: cond = None  # 組み合わせ対象外の変数は常に "*" 扱い
+                        if cond:
+                            emit(f"    if {cond}: active = found = True")
+                            emit("    else: active = False")
                         else:
-                            active_block = False
-                    elif line_stripped.startswith(";;"):
-                        active_block = False 
+                            emit("    active = False")
+                    elif is_dsemi:
+                        emit("    active = False")
                         continue
-                
-                if active_block:
-                    line_to_parse = line.replace("export ", "").strip()
-                    if is_pattern_line: line_to_parse = line_to_parse.split(")", 1)[-1].strip()
-                    if line_to_parse.endswith(";;"): line_to_parse = line_to_parse[:-2].strip()
-                    line_to_parse = line_to_parse.split('#', 1)[0].strip()
-                    var_match = VAR_ASSIGN_PAT.match(line_to_parse)
-                    if var_match:
-                        var_name = var_match.group(1)
-                        value = var_match.group(3) if var_match.group(3) is not None else var_match.group(2)
-                        value = value.strip("'\"")
-                        current_vars[var_name] = self._resolve_value(value, current_vars)
-            self.master_var_dict[combination] = current_vars
+                if assign:
+                    name, value = assign
+                    rhs = f"resolve({value!r}, v)" if "$" in value else repr(value)
+                    emit(f"    if active: v[{name!r}] = {rhs}")
+            elif kind == "IF":
+                emit("    active = True" if op[1] is None else f"    active = v.get({op[1]!r}, '') == {op[2]!r}")
+            elif kind == "ELSE":
+                emit("    active = not active")
+            elif kind == "FI":
+                emit("    active = True")
+            elif kind == "CASE":
+                case_active, case_var = True, op[1]
+                emit("    found = False")
+            elif kind == "ESAC":
+                case_active, case_var = False, None
+                emit("    found = False")
+                emit("    active = True")
+        emit("    return v")
+        namespace = {}
+        exec(compile("\n".join(src), "<comenv>", "exec"), namespace)
+        return namespace["_run"]
+
+    def _case_vars_with_assignments(self, ir):
+        """case ブロック内 (case ～ 次の case/esac) に代入文を持つ case 変数を返す"""
+        used, current = set(), None
+        for op in ir:
+            if op[0] == "CASE": current = op[1]
+            elif op[0] == "ESAC": current = None
+            elif op[0] == "LINE" and current and (op[3] or op[4]): used.add(current)
+        return used
+
+    def _compile_ir(self):
+        """
+        comenv の各行を (種別, 事前計算済みの値...) のタプルへ変換する
+        行の strip・正規表現マッチ・代入文の切り出しはここで1回だけ行う
+        """
+        ir = []
+        for line in self.lines:
+            line_stripped = line.strip()
+            if not line_stripped or line_stripped.startswith("#"): continue
+            if line_stripped.startswith("if"):
+                match = IF_PAT.search(line_stripped)
+                ir.append(("IF", match.group(1), match.group(2)) if match else ("IF", None, None))
+                continue
+            elif line_stripped.startswith("else"):
+                ir.append(("ELSE",))
+                continue
+            elif line_stripped.startswith("fi"):
+                ir.append(("FI",))
+                continue
+
+            if line_stripped.startswith("case"):
+                match = CASE_VAR_PAT.search(line_stripped)
+                if match: ir.append(("CASE", match.group(2) or match.group(3)))
+                continue
+            elif line_stripped.startswith("esac"):
+                ir.append(("ESAC",))
+                continue
+            
+            match = PATTERN_LINE_PAT.match(line_stripped)
+            pattern = match.group(1).strip() if match else None
+            # 代入文はパターン行として扱う場合/扱わない場合の両方を事前に切り出す
+            assign_plain = self._parse_assign(line, False)
+            assign_pat = self._parse_assign(line, True) if pattern is not None else None
+            ir.append(("LINE", pattern, line_stripped.startswith(";;"), assign_plain, assign_pat))
+        return ir
+
+    def _parse_assign(self, line, is_pattern_line):
+        line_to_parse = line.replace("export ", "").strip()
+        if is_pattern_line: line_to_parse = line_to_parse.split(")", 1)[-1].strip()
+        if line_to_parse.endswith(";;"): line_to_parse = line_to_parse[:-2].strip()
+        line_to_parse = line_to_parse.split('#', 1)[0].strip()
+        var_match = VAR_ASSIGN_PAT.match(line_to_parse)
+        if not var_match: return None
+        value = var_match.group(3) if var_match.group(3) is not None else var_match.group(2)
+        return var_match.group(1), value.strip("'\"")
 
     def get_var_dict_for_env(self, ajs_env_str):
         if not self.master_var_dict: return self.initial_vars 
@@ -223,25 +355,78 @@ class ShellParser:
                 for line in f:
                     line = line.strip().split('#', 1)[0].strip()
                     if not line: continue
-                    rm_match = RM_PAT.match(line)
-                    if rm_match:
-                        self.procedures.append(("RM", rm_match.group(1).strip()))
-                        continue 
-                    a_match = VAR_ASSIGN_PAT.match(line)
-                    if a_match:
-                        val = a_match.group(3) if a_match.group(3) is not None else a_match.group(2)
-                        self.procedures.append(("ASSIGN", a_match.group(1), val.strip("'\"")))
-                    b_match = RES_PAT.match(line)
-                    if b_match:
-                        var = b_match.group(0).split('=',1)[0]
-                        val = b_match.group(8)
-                        io_groups = (b_match.group(1), b_match.group(2), b_match.group(4), b_match.group(6))
-                        self.procedures.append(("IO_ASSIGN", var, val.strip("'\""), io_groups))
+                    # ★修正: 1回の正規表現マッチで判定 (I/O定義行は IO_ASSIGN のみ登録。値の代入も IO_ASSIGN で行われる)
+                    m = SHELL_LINE_PAT.match(line)
+                    if not m: continue
+                    kind = m.lastgroup
+                    # ★修正: 値テンプレートは解析時に分解しておき (末尾要素)、実行時は正規表現を使わない
+                    if kind == "rm":
+                        val = m.group(_RM_G + 1).strip()
+                        self.procedures.append(("RM", val, _tokenize_template(val)))
+                    elif kind == "res":
+                        o = _RES_G
+                        var = m.group(o).split('=',1)[0]
+                        val = m.group(o + 8).strip("'\"")
+                        io_groups = (m.group(o + 1), m.group(o + 2), m.group(o + 4), m.group(o + 6))
+                        self.procedures.append(("IO_ASSIGN", var, val, io_groups, _tokenize_template(val)))
+                    else:
+                        o = _ASSIGN_G
+                        val = m.group(o + 3) if m.group(o + 3) is not None else m.group(o + 2)
+                        val = val.strip("'\"")
+                        self.procedures.append(("ASSIGN", m.group(o + 1), val, _tokenize_template(val)))
         except Exception as e:
             _log(f"[Warning] Shell parse error ({self.shell_path}): {e}")
 
     def get_procedures(self): return self.procedures
 
+# --- シェル解析結果のディスクキャッシュ (パス -> (mtime, size, procedures)) ---
+SHELL_IR_CACHE_FILE = LOG_DIR / "shell_ir_cache.pkl"
+_SHELL_IR_VERSION = 2  # procedures の形式を変えた場合は上げる (古いキャッシュは破棄)
+_SHELL_IR_CACHE = None
+_SHELL_IR_DIRTY = False
+
+def _load_shell_ir_cache():
+    global _SHELL_IR_CACHE
+    if _SHELL_IR_CACHE is None:
+        _SHELL_IR_CACHE = {}
+        try:
+            with open(SHELL_IR_CACHE_FILE, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") == _SHELL_IR_VERSION: _SHELL_IR_CACHE = data["entries"]
+        except Exception: pass
+    return _SHELL_IR_CACHE
+
+def _save_shell_ir_cache():
+    global _SHELL_IR_DIRTY
+    if not _SHELL_IR_DIRTY: return
+    try:
+        tmp = SHELL_IR_CACHE_FILE.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": _SHELL_IR_VERSION, "entries": _SHELL_IR_CACHE}, f, protocol=5)
+        os.replace(tmp, SHELL_IR_CACHE_FILE)
+        _SHELL_IR_DIRTY = False
+    except Exception as e:
+        _log(f"[Warning] Shell cache save error: {e}")
+
+atexit.register(_save_shell_ir_cache)
+
+def parse_shell_cached(shell_path):
+    """更新日時・サイズが前回と同じシェルは解析を省略してキャッシュを返す"""
+    global _SHELL_IR_DIRTY
+    cache = _load_shell_ir_cache()
+    try:
+        st = os.stat(shell_path)
+    except OSError:
+        return ShellParser(shell_path).get_procedures()
+    key = os.path.abspath(shell_path)
+    hit = cache.get(key)
+    if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+        return hit[2]
+    procedures = ShellParser(shell_path).get_procedures()
+    cache[key] = (st.st_mtime_ns, st.st_size, procedures)
+    _SHELL_IR_DIRTY = True
+    return procedures
+
 class ShellExecutor:
     def __init__(self, procedures, comenv_dict, ajs_record):
         self.procedures = procedures
@@ -251,20 +436,22 @@ class ShellExecutor:
         self._init_context()
 
     def _init_context(self):
-        self.shell_context = copy.deepcopy(self.comenv_dict)
+        # ★修正: 値は全て文字列のため deepcopy は不要 (浅いコピーで十分)
+        self.shell_context = dict(self.comenv_dict)
         try:
-            env_vars = dict(item.split('=', 1) for item in self.ajs_record['env'].split(';') if '=' in item)
+            env_vars = dict(item.split('=', 1) for item in self.ajs_record.env.split(';') if '=' in item)
             self.shell_context.update(env_vars)
         except Exception: pass 
         try:
-            params = self.ajs_record['param'].split()
+            params = self.ajs_record.param.split()
             for i, param in enumerate(params): self.shell_context[f"{i+1}"] = param 
         except Exception: pass 
 
-    def _resolve_value(self, value_template):
-        if not value_template or "$" not in value_template: return value_template
-        replacer_func = _create_replacer(self.shell_context)
-        return ALL_VAR_PAT.sub(replacer_func, value_template)
+    def _resolve_value(self, tokens):
+        """_tokenize_template で分解済みのテンプレートを現在のコンテキストで展開する"""
+        if tokens.__class__ is str: return tokens
+        ctx = self.shell_context
+        return ''.join(p if p.__class__ is str else ctx.get(p[0], p[1]) for p in tokens)
 
     def execute(self):
         inputs, outputs = [], []
@@ -272,23 +459,22 @@ class ShellExecutor:
         for proc in self.procedures:
             op = proc[0]
             if op == "RM":
-                resolved = self._resolve_value(proc[1])
+                resolved = self._resolve_value(proc[2])
                 outputs = [f for f in outputs if f != resolved]
                 inputs = [f for f in inputs if f != resolved]
                 continue
             name, val_tmpl = proc[1], proc[2]
-            resolved_val = self._resolve_value(val_tmpl)
+            resolved_val = self._resolve_value(proc[-1])
             if op == "ASSIGN":
                 self.shell_context[name] = resolved_val
             elif op == "IO_ASSIGN":
                 self.shell_context[name] = resolved_val 
-                is_unresolved = False
-                if ALL_VAR_PAT.findall(resolved_val):
-                    for mt in ALL_VAR_PAT.findall(resolved_val):
-                        key = mt[1] or mt[2] or mt[3]
-                        if key not in self.shell_context: is_unresolved = True
-                if '`' in resolved_val or '$(' in resolved_val: is_unresolved = True
-                if is_unresolved: unresolved_io_vars.add(val_tmpl) 
+                # ★修正: 未解決判定は1回の走査で行い、見つかった時点で打ち切る
+                if '$' in resolved_val or '`' in resolved_val:
+                    ctx = self.shell_context
+                    if ('`' in resolved_val or '$(' in resolved_val
+                            or any(key not in ctx for key in _iter_var_keys(resolved_val))):
+                        unresolved_io_vars.add(val_tmpl) 
                 tag, io2, sys01, io3 = proc[3]
                 is_input = False
                 if "IN_FILE" in tag: is_input = True
@@ -300,6 +486,18 @@ class ShellExecutor:
                 else: outputs.append(resolved_val)
         return inputs, outputs, list(unresolved_io_vars)
 
+def _build_basename_index(res_root):
+    """
+    res_root 配下を1回だけ走査し、ファイル名 -> フルパス一覧 の索引を作る
+    (glob の "**" と同様に、"." で始まるファイル・フォルダは対象外)
+    """
+    index = collections.defaultdict(list)
+    for dirpath, dirnames, filenames in os.walk(res_root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for fn in filenames:
+            if not fn.startswith('.'): index[fn].append(os.path.join(dirpath, fn))
+    return index
+
 def inout_parse_ini_resource(path: str):
     inputs, outputs = [], []
     try:
@@ -320,74 +518,93 @@ def inout_parse_ini_resource(path: str):
     except Exception: pass 
     return sorted(list(set(inputs))), sorted(list(set(outputs)))
 
+def _json_default(o):
+    """JSON化できない型の変換 (AjsTable は行ごとの dict へ、それ以外は共通の変換)"""
+    if isinstance(o, AjsTable):
+        return o.to_dicts()
+    return json_default(o)
+
 def write_detail_log(log_data):
     """詳細ログ(JSON)出力"""
     try:
-        ld = log_data.copy()
-        # JSONシリアライズできないSet型などを変換
-        if "comenv_case_patterns" in ld:
-            ld["comenv_case_patterns"] = {k: list(v) for k, v in ld["comenv_case_patterns"].items()}
+        # ★修正: Set型・AjsTable は default フックで変換し、コピーが必要なのはキーの変換だけにする
+        ld = dict(log_data)
+        # namedtuple は標準 json では配列になるため dict へ、タプルのキーは文字列へ変換
+        if "ajs_mapping" in ld:
+            ld["ajs_mapping"] = [r._asdict() for r in ld["ajs_mapping"]]
         if "comenv_master_dictionary" in ld:
             ld["comenv_master_dictionary"] = {",".join(k): v for k, v in ld["comenv_master_dictionary"].items()}
         
-        with open(LOG_FILE_DETAIL, "w", encoding="utf-8") as f:
-            json.dump(ld, f, indent=2, ensure_ascii=False)
+        if ORJSON_AVAILABLE:
+            LOG_FILE_DETAIL.write_bytes(orjson.dumps(ld, option=orjson.OPT_INDENT_2, default=_json_default))
+        else:
+            with open(LOG_FILE_DETAIL, "w", encoding="utf-8") as f:
+                json.dump(ld, f, indent=2, ensure_ascii=False, default=_json_default)
         _log(f"[Info] Detail log saved: {LOG_FILE_DETAIL}")
     except Exception as e:
         _log(f"[Error] Failed to write detail log: {e}")
 
-def inout_parse_ajsprint_output(local_tmp_path):
-    ajs_mapping_list = []
-    headers = ["unit_full", "unit", "resource", "type", "env", "param"]
-    with codecs.open(local_tmp_path, "r", "cp932", errors="ignore") as f:
-        for line in f:
-            parts = line.rstrip("\n").split("\t")
-            if len(parts) < len(headers): parts.extend([""] * (len(headers) - len(parts)))
-            ajs_mapping_list.append(dict(zip(headers, parts)))
-    return ajs_mapping_list
+def inout_parse_ajsprint_output(raw_data):
+    """ajsprint の出力 (cp932 のバイト列) を AjsRecord のリストへ変換する"""
+    # ★修正: 一括デコードして行・タブで分割する (フィールド中の \r や長大なフィールドでも例外にしない)
+    lines = raw_data.decode("cp932", "ignore").split("\n")
+    if lines and not lines[-1]: lines.pop()  # 末尾改行による空要素は除外
+    make = AjsRecord._make
+    return [make((*line.split("\t"), *_AJS_EMPTY_FIELDS)[:6]) for line in lines]
 
 def inout_resolve_path_variables(paths, var_dict):
     resolved_paths, unresolved_vars = [], set()
-    replacer_func = _create_replacer(var_dict)
+    # ★修正: 置換と未解決変数の検出を1回の走査で行う (置換後の再走査をやめる)
+    #        置換した値自体に $参照 が含まれる場合のみ、その値の中を確認する
+    def replacer_func(match):
+        key = match.group(2) or match.group(3) or match.group(4)
+        if key not in var_dict:
+            unresolved_vars.add(key)
+            return match.group(0)
+        value = var_dict[key]
+        if "$" in value: unresolved_vars.update(k for k in _iter_var_keys(value) if k not in var_dict)
+        return value
     for path in paths:
         if "$" not in path:
             resolved_paths.append(path)
             continue
-        resolved_path = ALL_VAR_PAT.sub(replacer_func, path)
-        resolved_paths.append(resolved_path)
-        if ALL_VAR_PAT.findall(resolved_path):
-            for mt in ALL_VAR_PAT.findall(resolved_path):
-                key = mt[1] or mt[2] or mt[3]
-                if key not in var_dict: unresolved_vars.add(key) 
+        resolved_paths.append(ALL_VAR_PAT.sub(replacer_func, path))
     return resolved_paths, list(unresolved_vars)
 
 def inout_parse_exceptions_json(ajs_record, rules, bank, var_dict):
-    def resolve_path(path_template, context_vars):
+    params = ajs_record.param.split()
+    def pm_replacer(m):
+        i = int(m.group(1))
+        return params[i] if len(params) > i else m.group(0)
+    def en_replacer(m):
+        return var_dict.get(m.group(1), m.group(0))
+
+    def resolve_path(path_template, replacer_func):
         path = path_template
         if "$" not in path: return path
-        replacer_func = _create_replacer(context_vars)
         for _ in range(5): 
             last_path = path
             path = ALL_VAR_PAT.sub(replacer_func, path)
-            path = re.sub(r"\$\{PM\[(\d+)\]\}", lambda m: ajs_record['param'].split()[int(m.group(1))] if len(ajs_record['param'].split()) > int(m.group(1)) else m.group(0), path)
-            path = re.sub(r"\$\{EN\[([^}]+)\]\}", lambda m: var_dict.get(m.group(1), m.group(0)), path)
+            path = PM_PAT.sub(pm_replacer, path)
+            path = EN_PAT.sub(en_replacer, path)
             if path == last_path: return path 
         return path
 
     for rule in rules:
         if not fnmatch(bank, rule.get("bank", "*")): continue
-        if not fnmatch(os.path.basename(ajs_record['resource']), rule.get("shell", "*")): continue
-        if not fnmatch(ajs_record['unit'], rule.get("unit", "*")): continue
+        if not fnmatch(os.path.basename(ajs_record.resource), rule.get("shell", "*")): continue
+        if not fnmatch(ajs_record.unit, rule.get("unit", "*")): continue
             
-        context_vars = copy.deepcopy(var_dict) 
-        try: context_vars.update(dict(item.split('=', 1) for item in ajs_record['env'].split(';') if '=' in item))
+        context_vars = dict(var_dict) 
+        try: context_vars.update(dict(item.split('=', 1) for item in ajs_record.env.split(';') if '=' in item))
         except Exception: pass
         try: 
-            for i, p in enumerate(ajs_record['param'].split()): context_vars[f"{i+1}"] = p 
+            for i, p in enumerate(ajs_record.param.split()): context_vars[f"{i+1}"] = p 
         except Exception: pass
 
-        inputs = [resolve_path(p, context_vars) for p in rule.get("inputs", [])]
-        outputs = [resolve_path(p, context_vars) for p in rule.get("outputs", [])]
+        replacer_func = _create_replacer(context_vars)
+        inputs = [resolve_path(p, replacer_func) for p in rule.get("inputs", [])]
+        outputs = [resolve_path(p, replacer_func) for p in rule.get("outputs", [])]
         source_tag = rule.get("source_tag", "例外JSON")
         
         _, u_in = inout_resolve_path_variables(inputs, context_vars)
@@ -399,39 +616,73 @@ def inout_parse_exceptions_json(ajs_record, rules, bank, var_dict):
 def inout_write_excel(path, records, headers):
     if not OPENPYXL_AVAILABLE: raise ImportError("openpyxl missing")
     NG_FILL = PatternFill(start_color="FFFFD2D2", end_color="FFFFD2D2", fill_type="solid")
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "AJS入出力解析"
-    ws.append(headers)
-    for record in records:
-        in_files = "\n".join(record.get('inputs', []))
-        out_files = "\n".join(record.get('outputs', []))
-        ws.append([record.get('unit_full', ''), record.get('unit', ''), record.get('resource', ''), in_files, out_files, record.get('source_tag', '不明')])
-        if "解析失敗" in record.get('source_tag', '') or (not in_files and not out_files and "リソース指定なし" not in record.get('source_tag', '')):
-            for cell in ws[ws.max_row]: cell.fill = NG_FILL
-    for row in ws.rows:
-        for cell in row: cell.alignment = Alignment(wrap_text=True, vertical='top')
-    for col in ws.columns:
-        max_len = 0
-        for cell in col:
-            try: max_len = max(max_len, max(len(l) for l in str(cell.value).split('\n')))
-            except: pass
-        ws.column_dimensions[col[0].column_letter].width = min((max_len + 2) * 1.2, 70)
+    WRAP = Alignment(wrap_text=True, vertical='top')
+    # ★修正: 行データと列幅 (最長行の文字数) を1パスで求める
+    #        (書き込み専用モードでは列幅を行より先に設定する必要があるため、シート出力前に算出)
+    rows = []
+    col_widths = [max(map(len, str(h).split('\n'))) for h in headers]
+    for unit_full, unit, resource, inputs, outputs, tag in zip(records.unit_full, records.unit, records.resource, records.inputs, records.outputs, records.source_tag):
+        row = (unit_full, unit, resource, "\n".join(inputs), "\n".join(outputs), tag)
+        for i, val in enumerate(row):
+            w = max(map(len, val.split('\n')))
+            if w > col_widths[i]: col_widths[i] = w
+        is_ng = "解析失敗" in tag or (not inputs and not outputs and "リソース指定なし" not in tag)
+        rows.append((row, is_ng))
+
+    # ★修正: 書き込み専用モードで逐次出力 (セルの木構造を保持しない)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("AJS入出力解析")
+    for i, w in enumerate(col_widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = min((w + 2) * 1.2, 70)
+    def make_cells(values, fill=None):
+        cells = []
+        for v in values:
+            cell = WriteOnlyCell(ws, value=v)
+            cell.alignment = WRAP
+            if fill is not None: cell.fill = fill
+            cells.append(cell)
+        return cells
+    ws.append(make_cells(headers))
+    for row, is_ng in rows:
+        ws.append(make_cells(row, NG_FILL if is_ng else None))
     wb.save(path)
 
 def inout_write_csv(path, records, headers):
     with open(path, "w", encoding="utf-8-sig", newline="") as cf:
-        w = csv.DictWriter(cf, fieldnames=headers)
-        w.writeheader()
-        for record in records:
-            w.writerow({headers[0]: record.get('unit_full', ''), headers[1]: record.get('unit', ''), headers[2]: record.get('resource', ''), headers[3]: " | ".join(record.get('inputs', [])), headers[4]: " | ".join(record.get('outputs', [])), headers[5]: record.get('source_tag', '不明')})
+        w = csv.writer(cf)
+        w.writerow(headers)
+        w.writerows((unit_full, unit, resource, " | ".join(inputs), " | ".join(outputs), tag)
+                    for unit_full, unit, resource, inputs, outputs, tag in zip(records.unit_full, records.unit, records.resource, records.inputs, records.outputs, records.source_tag))
+
+def _fetch_ajsprint_output(ssh, get_ssh_client, cmd):
+    """
+    リモートで ajsprint を実行し、標準出力をメモリへ読み込んで返す
+    ssh を渡した場合はその接続を使い回す (None の場合は get_ssh_client で取得する)
+    """
+    ssh_ctx = contextlib.nullcontext(ssh) if ssh is not None else get_ssh_client()
+    with ssh_ctx as ssh:
+        ch = ssh.get_transport().open_session()
+        ch.set_combine_stderr(False)
+        ch.exec_command(cmd.encode("cp932"))
+        # ★修正: リモートの一時ファイル (出力→SFTP取得→削除) をやめ、標準出力をそのまま受信
+        #        標準エラーは別スレッドで並行して読み切る (ウィンドウが埋まるとリモート側が停止するため)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
+            err_future = ex.submit(ch.makefile_stderr('rb').read)
+            raw_data = ch.makefile('rb').read()
+            err_data = err_future.result()
+        if ch.recv_exit_status() != 0:
+            err = err_data.decode('cp932','ignore')
+            _log(f"[Error] AJS command failed: {err}")
+            raise RuntimeError(f"AJSコマンドエラー: {err}")
+    return raw_data
 
 # -----------------------------------------------------------------------------
 # ★ 解析コアロジック (キャッシュ対応 & 変数名リファクタリング)
 # -----------------------------------------------------------------------------
-def analyze_ajs_jobs(gui_vars, gui_funcs, out_dir=None, use_cache=True):
+def analyze_ajs_jobs(gui_vars, gui_funcs, out_dir=None, use_cache=True, ssh=None):
     """
     AJS定義取得～I/O解析までを行う再利用可能な関数
+    ssh を渡した場合はその接続を使い回す (呼び出し元でクローズする)
     """
     global _ANALYSIS_CACHE, _LAST_CACHE_KEY
     
@@ -458,8 +709,9 @@ def analyze_ajs_jobs(gui_vars, gui_funcs, out_dir=None, use_cache=True):
     if use_cache and current_key in _ANALYSIS_CACHE:
         update_status("解析結果をキャッシュから復元中...", 10)
         _log(f"[Cache] Hit! Using cached analysis data.")
-        time.sleep(0.5) 
-        return _ANALYSIS_CACHE[current_key]
+        # ★修正: 表示用の待機 (sleep) は削除。利用したエントリは末尾へ移動 (LRU)
+        cached = _ANALYSIS_CACHE[current_key] = _ANALYSIS_CACHE.pop(current_key)
+        return cached
 
     if not all([ajs_path, res_root, bank]):
         raise ValueError("AJSパス、リソースパス、銀行名が不足しています。")
@@ -489,16 +741,6 @@ def analyze_ajs_jobs(gui_vars, gui_funcs, out_dir=None, use_cache=True):
         except Exception: pass
     log_data["config_initial_vars"] = initial_vars
 
-    update_status("comenv 解析中...", 15)
-    c_files = glob.glob(os.path.join(res_root, "**", "comenv"), recursive=True)
-    comenv_path = c_files[0] if c_files else None
-    log_data["comenv_path"] = comenv_path
-    _log(f"[Analyze] comenv found: {comenv_path}")
-    
-    comenv_parser = ComenvParser(comenv_path, initial_vars, log_data)
-    comenv_parser.parse_all_patterns()
-    
-    update_status("AJS定義取得中...", 30)
     export_list = []
     export_list.append(f'export JP1_HOSTNAME={shlex.quote(jp1_hostname)}')
     export_list.append(f'export JP1_USERNAME={shlex.quote(jp1_username)}')
@@ -508,26 +750,32 @@ def analyze_ajs_jobs(gui_vars, gui_funcs, out_dir=None, use_cache=True):
     tmp_dir = out_dir / "tmp"
     tmp_dir.mkdir(exist_ok=True)
     
-    remote_tmp = f"/tmp/ajs_out_anl_{time.time()}.txt"
     local_tmp = tmp_dir / "ajs_out_raw.txt" # tmp配下へ
     
-    cmd = f'{env_str} && {ajs_print_path} -F AJSROOT1 -f "%JN%t%jn%t%sc%t%TY%t%En%t%pm" -R {shlex.quote(ajs_path)} > {remote_tmp}'
+    cmd = f'{env_str} && {ajs_print_path} -F AJSROOT1 -f "%JN%t%jn%t%sc%t%TY%t%En%t%pm" -R {shlex.quote(ajs_path)}'
     
     _log(f"[Analyze] Executing remote command: {cmd}")
     
-    with get_ssh_client() as ssh:
-        ch = ssh.get_transport().open_session()
-        ch.exec_command(cmd.encode("cp932"))
-        if ch.recv_exit_status() != 0:
-            err = ch.makefile_stderr().read().decode('cp932','ignore')
-            _log(f"[Error] AJS command failed: {err}")
-            raise RuntimeError(f"AJSコマンドエラー: {err}")
-        sftp = ssh.open_sftp()
-        sftp.get(str(remote_tmp), str(local_tmp))
-        sftp.close()
-        ssh.exec_command(f"rm -f {remote_tmp}")
+    update_status("AJS定義取得・comenv 解析中...", 15)
+    # ★修正: リモートの ajsprint 実行・取得 (通信待ち) を別スレッドで進め、その間に索引構築・comenv 解析を行う
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        fetch_future = pool.submit(_fetch_ajsprint_output, ssh, get_ssh_client, cmd)
+        
+        # ★修正: リソース配下はここで1回だけ走査し、以降のファイル検索は索引を引く
+        basename_index = _build_basename_index(res_root)
+        c_files = basename_index.get("comenv")
+        comenv_path = c_files[0] if c_files else None
+        log_data["comenv_path"] = comenv_path
+        _log(f"[Analyze] comenv found: {comenv_path}")
+        
+        comenv_parser = ComenvParser(comenv_path, initial_vars, log_data)
+        comenv_parser.parse_all_patterns()
+        
+        update_status("AJS定義取得中...", 30)
+        raw_data = fetch_future.result()
+    local_tmp.write_bytes(raw_data)  # 調査用に生データは従来どおり tmp へ残す
         
-    ajs_mapping_list = inout_parse_ajsprint_output(local_tmp)
+    ajs_mapping_list = inout_parse_ajsprint_output(raw_data)
     _log(f"[Analyze] Retrieved {len(ajs_mapping_list)} units.")
     log_data["ajs_mapping"] = ajs_mapping_list
 
@@ -539,53 +787,62 @@ def analyze_ajs_jobs(gui_vars, gui_funcs, out_dir=None, use_cache=True):
 
     update_status("シェル解析キャッシュ構築...", 60)
     shell_cache = {}
-    unique_shells = set(r['resource'] for r in ajs_mapping_list if r['resource'] and not r['resource'].endswith('.ini'))
+    unique_shells = set(r.resource for r in ajs_mapping_list if r.resource and not r.resource.endswith('.ini'))
+    shell_paths = {}
     for sname in unique_shells:
-        sfiles = glob.glob(os.path.join(res_root, "**", os.path.basename(sname)), recursive=True)
-        if sfiles:
-            procedures = ShellParser(sfiles[0]).get_procedures()
+        sfiles = basename_index.get(os.path.basename(sname))
+        if sfiles: shell_paths[sname] = sfiles[0]
+    # ★修正: シェルごとの読込・解析は独立しているため並列に実行
+    _load_shell_ir_cache()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 4)) as pool:
+        for sname, procedures in zip(shell_paths, pool.map(parse_shell_cached, shell_paths.values())):
             shell_cache[sname] = procedures
             log_data["shell_cache_build_log"][sname] = procedures
+    _save_shell_ir_cache()
 
     update_status("I/O変数解決実行中...", 70)
-    final_records = []
+    # ★修正: 結果は列ごとのテーブルへ格納 (入出力・タグは各列へ追記)
+    final_records = AjsTable(ajs_mapping_list)
     for record in ajs_mapping_list:
-        r_copy = record.copy()
         inputs, outputs, tag = [], [], None
-        var_dict = comenv_parser.get_var_dict_for_env(r_copy['env'])
+        var_dict = comenv_parser.get_var_dict_for_env(record.env)
         
-        if not r_copy['resource']: tag = "リソース指定なし"
+        if not record.resource: tag = "リソース指定なし"
         
         if tag is None and ex_rules:
-            i_j, o_j, t_j = inout_parse_exceptions_json(r_copy, ex_rules, bank, var_dict)
+            i_j, o_j, t_j = inout_parse_exceptions_json(record, ex_rules, bank, var_dict)
             if t_j:
                 inputs, outputs, tag = i_j, o_j, t_j
-                log_data["json_exceptions_log"][r_copy['unit_full']] = {'in': inputs, 'out': outputs, 'tag': tag}
+                log_data["json_exceptions_log"][record.unit_full] = {'in': inputs, 'out': outputs, 'tag': tag}
         
-        if tag is None and r_copy['resource'] in shell_cache:
-            executor = ShellExecutor(shell_cache[r_copy['resource']], var_dict, r_copy)
+        if tag is None and record.resource in shell_cache:
+            executor = ShellExecutor(shell_cache[record.resource], var_dict, record)
             inputs, outputs, unres = executor.execute()
             tag = f"解析失敗: 未解決 {unres}" if unres else ("シェル解析 (IO定義無)" if not inputs and not outputs else "シェル解析 (変数解決)")
-            log_data["shell_execution_log"][r_copy['unit_full']] = {'in': inputs, 'out': outputs, 'unresolved': unres, 'tag': tag}
+            log_data["shell_execution_log"][record.unit_full] = {'in': inputs, 'out': outputs, 'unresolved': unres, 'tag': tag}
 
-        if tag is None and r_copy['resource'] and r_copy['resource'].endswith('.ini'):
-            files = glob.glob(os.path.join(res_root, "**", os.path.basename(r_copy['resource'])), recursive=True)
+        if tag is None and record.resource and record.resource.endswith('.ini'):
+            files = basename_index.get(os.path.basename(record.resource))
             if files:
                 raw_in, raw_out = inout_parse_ini_resource(files[0])
                 inputs, u_in = inout_resolve_path_variables(raw_in, var_dict)
                 outputs, u_out = inout_resolve_path_variables(raw_out, var_dict)
                 tag = f"解析失敗: 未解決 {{{', '.join(set(u_in + u_out))}}}" if u_in or u_out else ("正規表現 (変数解決)" if inputs or outputs else "正規表現 (IO定義無)")
-                log_data["ini_regex_log"][r_copy['unit_full']] = {'in': inputs, 'out': outputs, 'tag': tag}
+                log_data["ini_regex_log"][record.unit_full] = {'in': inputs, 'out': outputs, 'tag': tag}
             else: tag = "不明 (リソース無)"
 
         if tag is None: tag = "不明 (非解析対象)"
         
-        r_copy['inputs'], r_copy['outputs'], r_copy['source_tag'] = inputs, outputs, tag
-        final_records.append(r_copy)
+        final_records.inputs.append(inputs)
+        final_records.outputs.append(outputs)
+        final_records.source_tag.append(tag)
 
     log_data["final_records"] = final_records
     
+    _ANALYSIS_CACHE.pop(current_key, None)
     _ANALYSIS_CACHE[current_key] = (final_records, log_data)
+    while len(_ANALYSIS_CACHE) > _ANALYSIS_CACHE_MAX:
+        del _ANALYSIS_CACHE[next(iter(_ANALYSIS_CACHE))]
     _LAST_CACHE_KEY = current_key
     
     return final_records, log_data
@@ -595,9 +852,11 @@ def inout_start_job(gui_vars, gui_funcs):
     save_hist = gui_funcs['save_hist']
     show_info = gui_funcs['show_info']
     show_error = gui_funcs['show_error']
+    set_result_rows = gui_funcs['set_result_rows']
     text_box = gui_vars.get('inout_text_box') 
     
-    if text_box: text_box.delete('1.0', 'end')
+    # ★修正: Treeview の操作はワーカースレッドから直接行わず、UI キュー経由で Tk スレッドに任せる
+    if text_box: set_result_rows(text_box, [])
     
     with open(LOG_FILE_RUN, "w", encoding="utf-8") as f:
         f.write(f"=== Tab 3 (InOut) Execution Start: {datetime.datetime.now()} ===\n")
@@ -626,9 +885,15 @@ def inout_start_job(gui_vars, gui_funcs):
         _log(f"[Info] Saved result to: {out_path}")
 
         if text_box:
-            problems = [f"・{r['unit_full']} ({r['source_tag']})" for r in final_records if "解析失敗" in r['source_tag'] or (not r['inputs'] and not r['outputs'] and "リソース指定なし" not in r['source_tag'])]
-            if problems: text_box.insert('end', f"--- 問題検出 ({len(problems)}件) ---\n" + "\n".join(problems))
-            else: text_box.insert('end', "--- 問題なし ---")
+            # ★修正: 結果欄は Treeview (ユニット完全名称, 備考) になったので1件1行で追加
+            problems = [(unit_full, tag) for unit_full, inputs, outputs, tag in zip(final_records.unit_full, final_records.inputs, final_records.outputs, final_records.source_tag)
+                        if "解析失敗" in tag or (not inputs and not outputs and "リソース指定なし" not in tag)]
+            # 表示は先頭 RESULT_DISPLAY_MAX 件まで (全件は出力ファイルを参照)
+            rows = problems[:RESULT_DISPLAY_MAX]
+            if len(problems) > RESULT_DISPLAY_MAX:
+                rows.append((f"... 他 {len(problems) - RESULT_DISPLAY_MAX} 件 (全件は {out_path.name} を参照)", ""))
+            if not problems: rows = [("--- 問題なし ---", "")]
+            set_result_rows(text_box, rows, f"問題検出 {len(problems)}件")
 
         write_detail_log(log_data)
         update_status("完了", 100)
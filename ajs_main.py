@@ -12,8 +12,14 @@ v4.6 (2025-11-23) - バグ修正(create_result_textbox定義漏れ), 解析結
 5. 依存関係解析 (Dependency Analysis)
 """
 
+import atexit
 import json
+import os
+import queue
+import socket
 import threading
+import time
+import weakref
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
 import paramiko
@@ -28,84 +34,78 @@ from ajs_rel_logic import pre_start_job
 from ajs_depend_logic import open_t5_job_runner 
 from ajs_exception_editor import open_editor_window
 
+# 実行環境はホイール処理のたびに判定せず、起動時に1回だけ判定
+_IS_WINDOWS = platform.system() == "Windows"
+
 # ───────────── ★ デザイン定数 ─────────────
 PAD_X = 5
 PAD_Y = 3
 BTN_PAD_Y = 10
 
-# ───────────── ★ 共通ヘルパー ─────────────
-class Tooltip:
-    def __init__(self, widget, text):
-        self.widget = widget
-        self.text = text
-        self.tooltip = None
-        self.widget.bind("<Enter>", self.show_tooltip)
-        self.widget.bind("<Leave>", self.hide_tooltip)
-
-    def show_tooltip(self, event):
-        x, y, _, _ = self.widget.bbox("insert")
-        x += self.widget.winfo_rootx() + 20
-        y += self.widget.winfo_rooty() + 20
-        self.tooltip = tk.Toplevel(self.widget)
-        self.tooltip.wm_overrideredirect(True) 
-        self.tooltip.wm_geometry(f"+{x}+{y}")
-        label = tk.Label(
-            self.tooltip, 
-            text=self.text, 
-            background="#ffffe0", 
-            relief="solid", 
-            borderwidth=1,
-            font=("", 9, "normal"), 
-            padx=4, 
-            pady=4
-        ) 
-        label.pack()
-
-    def hide_tooltip(self, event):
-        if self.tooltip:
-            self.tooltip.destroy()
-        self.tooltip = None
-
 # ───────────── ★ スクロール制御付きウィジェット作成関数 (ここを追加) ─────────────
 
-def setup_scroll_handling(widget, main_scroll_func):
+# ★修正: Enter/Leave のたびに bind_all を張り替える方式をやめ、ホイールは root の1か所で受けて振り分ける
+#        (ポインタ下のウィジェットから親をたどり、登録済みの領域があればそこを、無ければ全体をスクロール)
+_LOCAL_SCROLLERS = weakref.WeakKeyDictionary()  # ウィジェット -> スクロール対象
+
+def register_local_scroller(widget, target=None):
+    """widget (とその子孫) 上のホイール操作で target (省略時は widget 自身) をスクロールさせる"""
+    _LOCAL_SCROLLERS[widget] = target if target is not None else widget
+
+def _wheel_units(event):
+    if _IS_WINDOWS: return -event.delta / 120
+    return -1 if event.num == 4 else (1 if event.num == 5 else 0)
+
+# ★追加: 連続したホイールイベントは量だけ貯めて、アイドル時にまとめて1回スクロールする
+_pending_wheel = {}  # スクロール対象 -> 未反映のスクロール量 (行単位, 小数可)
+
+def _queue_scroll(target, units):
+    if not units: return
+    if not _pending_wheel: root.after_idle(_flush_wheel)
+    _pending_wheel[target] = _pending_wheel.get(target, 0) + units
+
+def _flush_wheel():
+    pending = list(_pending_wheel.items())
+    _pending_wheel.clear()
+    for target, units in pending:
+        if int(units) == 0: continue
+        try: target.yview_scroll(int(units), "units")
+        except tk.TclError: pass  # 反映前にウィンドウが閉じられた場合
+
+def _global_wheel_dispatch(event):
+    try:
+        w = root.winfo_containing(event.x_root, event.y_root)
+    except Exception:
+        w = None  # ttk の内部ウィジェット (Combobox のリスト等) は名前から引けない
+    while w is not None:
+        target = _LOCAL_SCROLLERS.get(w)
+        if target is not None:
+            _queue_scroll(target, _wheel_units(event))
+            return "break"
+        w = w.master
+    on_main_mousewheel(event)
+
+def debounced(widget, delay_ms, func):
     """
-    ウィジェット上のマウスホイール操作を、そのウィジェット専用にする。
-    (親画面のスクロールを止める return "break" を使用)
+    連続するイベントをまとめ、最後のイベントから delay_ms 後に func を1回だけ呼ぶハンドラを返す
+    (ウィンドウのリサイズ中などに毎回重い処理が走らないようにする)
     """
-    def _on_local_wheel(event):
-        if platform.system() == "Windows":
-            widget.yview_scroll(int(-1 * (event.delta / 120)), "units")
-        elif event.num == 4:
-            widget.yview_scroll(-1, "units")
-        elif event.num == 5:
-            widget.yview_scroll(1, "units")
-        return "break" # 親への伝播を阻止
-
-    def _bind_local(event):
-        if platform.system() == "Windows":
-            widget.bind_all("<MouseWheel>", _on_local_wheel)
-        else:
-            widget.bind_all("<Button-4>", _on_local_wheel)
-            widget.bind_all("<Button-5>", _on_local_wheel)
-
-    def _unbind_local(event):
-        # メイン画面のスクロールに戻す
-        if platform.system() == "Windows":
-            widget.bind_all("<MouseWheel>", main_scroll_func)
-        else:
-            widget.bind_all("<Button-4>", main_scroll_func)
-            widget.bind_all("<Button-5>", main_scroll_func)
-
-    widget.bind("<Enter>", _bind_local)
-    widget.bind("<Leave>", _unbind_local)
-
-
-def create_result_textbox(parent, main_scroll_func, height=10):
+    pending = [None]
+    def _run():
+        pending[0] = None
+        func()
+    def handler(event=None):
+        if pending[0] is not None: widget.after_cancel(pending[0])
+        pending[0] = widget.after(delay_ms, _run)
+    return handler
+
+
+def create_result_textbox(parent, height=10):
     """
     横スクロールバー付き、折り返しなしのテキストボックスを作成する
     """
-    frame = ttk.Frame(parent)
+    # ★修正: 枠線は外側のフレームで1回だけ描画し、Text 自体は枠なし (スクロール時の枠再描画を省く)
+    frame = ttk.Frame(parent, relief="solid", borderwidth=1, padding=0)
     frame.pack(fill="both", expand=True)
 
     # スクロールバー
@@ -113,7 +113,9 @@ def create_result_textbox(parent, main_scroll_func, height=10):
     h_scroll = ttk.Scrollbar(frame, orient="horizontal")
 
     # テキストウィジェット (wrap="none" で折り返しなし)
-    text_widget = tk.Text(frame, height=height, wrap="none", undo=False, borderwidth=1, relief="solid")
+    text_widget = tk.Text(frame, height=height, wrap="none", undo=False, borderwidth=0, highlightthickness=0)
+    # ★追加: 結果表示専用 (読み取り専用・アンドゥ記録なし)。内容の書き換えは set_result_text で行う
+    text_widget.configure(state="disabled", maxundo=0, autoseparators=False, exportselection=False)
     
     # 配置 (Gridを使用)
     text_widget.grid(row=0, column=0, sticky="nsew")
@@ -130,81 +132,195 @@ def create_result_textbox(parent, main_scroll_func, height=10):
     h_scroll.config(command=text_widget.xview)
 
     # スクロール干渉防止
-    setup_scroll_handling(text_widget, main_scroll_func)
+    register_local_scroller(text_widget)
 
     return text_widget
 
+class LazyResultTextbox:
+    """
+    ★追加: create_result_textbox の遅延版。親フレームが初めて表示された時 (<Map>) に
+    Text とスクロールバーを作成する。insert/delete 等は作成済みの Text へ委譲する
+    (表示前に呼ばれた場合はその場で作成)
+    """
+    def __init__(self, parent, height=10):
+        self._parent = parent
+        self._height = height
+        self._text = None
+        parent.bind("<Map>", self._build, add="+")
+
+    def _build(self, event=None):
+        if self._text is None:
+            self._text = create_result_textbox(self._parent, height=self._height)
+        return self._text
+
+    def __getattr__(self, name):
+        if name.startswith('_'): raise AttributeError(name)
+        return getattr(self._build(), name)
+
+def create_result_tree(parent, height=10, columns=("col1",)):
+    """
+    ★追加: 表形式の結果用 (見出し付き Treeview)。表示範囲の行だけ描画されるため大量行でも軽い
+    スクロールバーの配置は create_result_textbox と同じ
+    """
+    frame = ttk.Frame(parent)
+    frame.pack(fill="both", expand=True)
+
+    v_scroll = ttk.Scrollbar(frame, orient="vertical")
+    h_scroll = ttk.Scrollbar(frame, orient="horizontal")
+
+    tree = ttk.Treeview(frame, columns=columns, show="headings", height=height)
+    for col in columns:
+        tree.heading(col, text=col, anchor="w")
+        tree.column(col, anchor="w", width=200, stretch=True)
+
+    tree.grid(row=0, column=0, sticky="nsew")
+    v_scroll.grid(row=0, column=1, sticky="ns")
+    h_scroll.grid(row=1, column=0, sticky="ew")
+
+    frame.grid_rowconfigure(0, weight=1)
+    frame.grid_columnconfigure(0, weight=1)
+
+    tree.config(yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set)
+    v_scroll.config(command=tree.yview)
+    h_scroll.config(command=tree.xview)
+
+    register_local_scroller(tree)
+
+    return tree
+
 
 # ───────────── ★ リストエディタ (スクロール制御付き) ─────────────
 class FileListEditor(ttk.Frame):
-    def __init__(self, parent, main_scroll_func):
+    """
+    ファイル一覧の入力欄
+    ★修正: 値は Python のリストで保持し、入力欄は表示できる行数分だけ生成して使い回す (仮想スクロール)
+    """
+    ROW_PAD = 2
+
+    def __init__(self, parent):
         super().__init__(parent)
-        self.main_scroll_func = main_scroll_func 
         
-        self.canvas_frm = ttk.Frame(self, relief="sunken", borderwidth=1)
-        self.canvas_frm.pack(fill="both", expand=True, pady=(0, 5))
+        self.list_frm = ttk.Frame(self, relief="sunken", borderwidth=1)
+        self.list_frm.pack(fill="both", expand=True, pady=(0, 5))
         
-        self.canvas = tk.Canvas(self.canvas_frm, borderwidth=0, background="#ffffff", height=100)
-        self.scroll_frame = ttk.Frame(self.canvas) 
-        self.vsb = ttk.Scrollbar(self.canvas_frm, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.vsb.set)
-
+        self.viewport = tk.Frame(self.list_frm, borderwidth=0, background="#ffffff", height=100)
+        self.vsb = ttk.Scrollbar(self.list_frm, orient="vertical", command=self.yview)
         self.vsb.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.canvas_window_id = self.canvas.create_window((0, 0), window=self.scroll_frame, anchor="nw")
-
-        self.scroll_frame.bind("<Configure>", self._on_frame_configure)
-        self.canvas.bind("<Configure>", self._on_canvas_configure)
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.viewport.bind("<Configure>", self._on_viewport_configure)
         
-        # 干渉防止
-        setup_scroll_handling(self.canvas, self.main_scroll_func)
-
-        self.rows = [] 
+        # 干渉防止 (一覧上のホイール操作はこのエディタをスクロール)
+        register_local_scroller(self.viewport, self)
+
+        self._values = []   # 全行の値
+        self._top = 0       # 先頭に表示している行の番号
+        self._pool = []     # 表示用の (entry, var, del_btn)
+        self._row_h = None
+        self._rendering = False
+        self._last_cfg_h = -1
+        # ★修正: 削除ボタンは行ごとに command (Tcl コマンド) を登録せず、共通のバインドタグで1つのハンドラへまとめる
+        self._del_tag = f"FileListDel{id(self)}"
+        self.bind_class(self._del_tag, "<ButtonRelease-1>", self._on_delete_click)
         
         btn_frame = ttk.Frame(self)
         btn_frame.pack(fill="x")
         ttk.Button(btn_frame, text="＋ 行を追加", command=lambda: self.add_row("")).pack(side="left", padx=PAD_X)
         ttk.Button(btn_frame, text="全クリア", command=self.clear_all).pack(side="right", padx=PAD_X)
 
-    def _on_frame_configure(self, event):
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-    
-    def _on_canvas_configure(self, event):
-        self.canvas.itemconfig(self.canvas_window_id, width=event.width)
+    def _add_slot(self):
+        slot = len(self._pool)
+        var = tk.StringVar()
+        entry = ttk.Entry(self.viewport, textvariable=var)
+        del_btn = ttk.Button(self.viewport, text="×", width=3)
+        del_btn.slot = slot
+        del_btn.bindtags(del_btn.bindtags() + (self._del_tag,))
+        var.trace_add("write", lambda *a, s=slot: self._on_edit(s))
+        self._pool.append((entry, var, del_btn))
+        if self._row_h is None:
+            self._row_h = max(entry.winfo_reqheight(), del_btn.winfo_reqheight()) + self.ROW_PAD * 2
+
+    def _on_viewport_configure(self, event):
+        # ★追加: 幅の変化は place(relwidth) が追従するので、行数が変わり得る高さ変化の時だけ再描画
+        if event.height == self._last_cfg_h: return
+        self._last_cfg_h = event.height
+        self._render()
+
+    def _visible_rows(self):
+        if self._row_h is None: self._add_slot()
+        return max(1, self.viewport.winfo_height() // self._row_h)
+
+    def _render(self):
+        visible = self._visible_rows()
+        n = len(self._values)
+        self._top = min(max(self._top, 0), max(0, n - visible))
+        # 一部だけ見える最下行の分も含めて入力欄を用意
+        while len(self._pool) < min(visible + 1, n - self._top):
+            self._add_slot()
+        self._rendering = True
+        try:
+            for slot, (entry, var, del_btn) in enumerate(self._pool):
+                idx = self._top + slot
+                if slot <= visible and idx < n:
+                    if var.get() != self._values[idx]: var.set(self._values[idx])
+                    y = slot * self._row_h + self.ROW_PAD
+                    btn_w = del_btn.winfo_reqwidth()
+                    entry.place(x=2, y=y, relwidth=1, width=-(btn_w + 9))
+                    del_btn.place(relx=1, x=-(btn_w + 2), y=y)
+                else:
+                    entry.place_forget()
+                    del_btn.place_forget()
+        finally:
+            self._rendering = False
+        if n: self.vsb.set(self._top / n, min(1.0, (self._top + visible) / n))
+        else: self.vsb.set(0, 1)
+
+    def _on_edit(self, slot):
+        # 入力内容はその場でリストへ反映
+        if self._rendering: return
+        idx = self._top + slot
+        if idx < len(self._values): self._values[idx] = self._pool[slot][1].get()
+
+    def yview(self, *args):
+        """スクロールバーからの操作 (moveto / scroll)"""
+        if not args: return
+        if args[0] == "moveto":
+            self._top = int(round(float(args[1]) * len(self._values)))
+        elif args[0] == "scroll":
+            step = self._visible_rows() if args[2] == "pages" else 1
+            self._top += int(args[1]) * step
+        self._render()
+
+    def yview_scroll(self, number, what):
+        self.yview("scroll", number, what)
 
     def add_row(self, text_value):
-        row_f = ttk.Frame(self.scroll_frame)
-        row_f.pack(fill="x", pady=2, padx=2)
-        
-        entry = ttk.Entry(row_f)
-        entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
-        entry.insert(0, text_value)
-        
-        del_btn = ttk.Button(row_f, text="×", width=3, command=lambda f=row_f: self.remove_row(f))
-        del_btn.pack(side="left")
-        
-        self.rows.append((row_f, entry))
-
-    def remove_row(self, frame):
-        for i, (f, e) in enumerate(self.rows):
-            if f == frame:
-                f.destroy()
-                self.rows.pop(i)
-                break
+        self._values.append(text_value)
+        self._top = len(self._values) # 追加した行が見えるよう末尾へ (_render で範囲内に補正)
+        self._render()
+
+    def _on_delete_click(self, event):
+        btn = event.widget
+        # ボタン外へ移動してから離した場合はクリック扱いにしない (command と同じ挙動)
+        if btn.winfo_containing(event.x_root, event.y_root) is not btn: return
+        self.remove_row(self._top + btn.slot)
+
+    def remove_row(self, index):
+        if 0 <= index < len(self._values):
+            del self._values[index]
+            self._render()
     
     def clear_all(self):
-        for f, e in self.rows:
-            f.destroy()
-        self.rows = []
+        self._values = []
+        self._top = 0
+        self._render()
 
     def get_values(self):
-        return [e.get().strip() for f, e in self.rows if e.get().strip()]
+        return [v for s in self._values if (v := s.strip())]
 
     def set_values(self, values_list):
-        self.clear_all()
-        for v in values_list:
-            if v:
-                self.add_row(v)
+        self._values = [v for v in values_list if v]
+        self._top = 0
+        self._render()
 
 
 # ───────────── メインウィンドウ構築 ─────────────
@@ -217,9 +333,10 @@ main_canvas = tk.Canvas(root)
 main_scrollbar = ttk.Scrollbar(root, orient="vertical", command=main_canvas.yview)
 scrollable_frame = ttk.Frame(main_canvas)
 
+# ★修正: スクロール範囲の再計算はリサイズ中に連続実行せず、落ち着いてから1回だけ行う
 scrollable_frame.bind(
     "<Configure>",
-    lambda e: main_canvas.configure(scrollregion=main_canvas.bbox("all"))
+    debounced(main_canvas, 50, lambda: main_canvas.configure(scrollregion=main_canvas.bbox("all")))
 )
 
 main_canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
@@ -229,18 +346,13 @@ main_scrollbar.pack(side="right", fill="y")
 main_canvas.pack(side="left", fill="both", expand=True)
 
 def on_main_mousewheel(event):
-    if platform.system() == "Windows":
-        main_canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-    elif event.num == 4:
-        main_canvas.yview_scroll(-1, "units")
-    elif event.num == 5:
-        main_canvas.yview_scroll(1, "units")
-
-if platform.system() == "Windows":
-    root.bind_all("<MouseWheel>", on_main_mousewheel)
+    _queue_scroll(main_canvas, _wheel_units(event))
+
+if _IS_WINDOWS:
+    root.bind_all("<MouseWheel>", _global_wheel_dispatch)
 else:
-    root.bind_all("<Button-4>", on_main_mousewheel)
-    root.bind_all("<Button-5>", on_main_mousewheel)
+    root.bind_all("<Button-4>", _global_wheel_dispatch)
+    root.bind_all("<Button-5>", _global_wheel_dispatch)
 
 
 # ==========================================
@@ -249,6 +361,14 @@ else:
 main_frm = ttk.Frame(scrollable_frame, padding=15)
 main_frm.pack(fill="both", expand=True)
 
+def make_hist_combobox(parent, var, key):
+    """
+    履歴付きの入力欄 (★修正: 候補は起動時に設定せず、ドロップダウンを開いた時に hist から設定する)
+    """
+    cb = ttk.Combobox(parent, textvariable=var)
+    cb.configure(postcommand=lambda: cb.configure(values=hist.get(key, [])))
+    return cb
+
 def load_hist():
     if not HIST_FILE.exists():
         return {}
@@ -268,11 +388,11 @@ conn_frm.columnconfigure(5, weight=1)
 
 ttk.Label(conn_frm, text="IP:").grid(row=0, column=0, sticky="e", padx=PAD_X)
 v_ip = tk.StringVar(root)
-ttk.Combobox(conn_frm, textvariable=v_ip, values=hist.get('ip', [])).grid(row=0, column=1, sticky="ew", padx=PAD_X)
+make_hist_combobox(conn_frm, v_ip, 'ip').grid(row=0, column=1, sticky="ew", padx=PAD_X)
 
 ttk.Label(conn_frm, text="User:").grid(row=0, column=2, sticky="e", padx=PAD_X)
 v_user = tk.StringVar(root)
-ttk.Combobox(conn_frm, textvariable=v_user, values=hist.get('user', [])).grid(row=0, column=3, sticky="ew", padx=PAD_X)
+make_hist_combobox(conn_frm, v_user, 'user').grid(row=0, column=3, sticky="ew", padx=PAD_X)
 
 ttk.Label(conn_frm, text="Pass:").grid(row=0, column=4, sticky="e", padx=PAD_X)
 v_pass = tk.StringVar(root)
@@ -376,28 +496,86 @@ v_jp1_username = tk.StringVar(root, DEFAULT_JP1_USERNAME)
 status_var = tk.StringVar(root, '待機中')
 progress = tk.DoubleVar(root, 0.0)
 BANKS = ["香川", "徳島大正", "トマト", "高知", "大光", "大東", "栃木", "静岡中央", "三十三", "その他"]
+BANK_COLS = 5
+# ★追加: 銀行ボタンの配置 (行, 列) は全タブ共通なので1回だけ計算
+_BANK_CELLS = [divmod(i, BANK_COLS) for i in range(len(BANKS))]
+
+def make_bank_grid(parent, var, on_select):
+    """銀行選択のラジオボタンを BANK_COLS 列で並べ、作成したボタンのリストを返す (★追加: Tab1/3/5 共通)"""
+    var.set(BANKS[0])
+    rbs = []
+    for b, (row, col) in zip(BANKS, _BANK_CELLS):
+        rb = ttk.Radiobutton(parent, text=b, variable=var, value=b, command=on_select)
+        rb.grid(row=row, column=col, sticky="w", padx=4)
+        rbs.append(rb)
+    return rbs
+
+def bank_cell_after(bank):
+    """指定した銀行ボタンの右隣のセル (行, 列)"""
+    row, col = _BANK_CELLS[BANKS.index(bank)]
+    return row, col + 1
 
 
 # --- ヘルパー関数 ---
+# ★修正: ジョブ (SSH 通信など) は専用のワーカースレッド1本で順に実行し、
+#        ワーカーからの画面更新はキューに積んで Tk スレッド側の定期処理でまとめて反映する
+_job_q = queue.Queue()   # (関数, args, kwargs, 実行ボタン)
+_ui_q = queue.Queue()    # Tk スレッドで実行する画面更新処理
+
+def _job_worker():
+    while True:
+        func, args, kwargs, btn = _job_q.get()
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            show_error(str(e))
+        finally:
+            if btn: _ui_q.put(lambda: btn.config(state="normal"))
+            _job_q.task_done()
+
+# 定期実行中の after ID (終了時にまとめて取り消す)
+_after_ids = {}
+
+def _drain_ui():
+    # 次回分を先に予約 (メッセージボックス表示中も他の画面更新は反映される)
+    _after_ids['drain_ui'] = root.after(50, _drain_ui)
+    while True:
+        try: ui_func = _ui_q.get_nowait()
+        except queue.Empty: break
+        ui_func()
+
 def update_status(msg, p_val=None):
-    root.after(0, lambda: status_var.set(msg))
+    _ui_q.put(lambda: status_var.set(msg))
     if p_val is not None:
-        root.after(0, lambda: progress.set(p_val))
+        _ui_q.put(lambda: progress.set(p_val))
+
+def set_result_text(text_widget, body):
+    """★追加: 読み取り専用の結果テキストボックスの内容を置き換える (Tk スレッドで実行)"""
+    def _apply():
+        text_widget.configure(state="normal")
+        text_widget.delete('1.0', 'end')
+        text_widget.insert('end', body)
+        text_widget.configure(state="disabled")
+    _ui_q.put(_apply)
+
+def set_result_rows(tree, rows, note=None):
+    """★追加: 結果 Treeview の行を置き換える (Tk スレッドで実行)。note は先頭列の見出しに付記する"""
+    def _apply():
+        tree.delete(*tree.get_children())
+        for row in rows: tree.insert('', 'end', values=row)
+        # note が無い場合は見出しを初期状態に戻す (前回の件数を残さない)
+        first_col = tree["columns"][0]
+        tree.heading(first_col, text=first_col if note is None else f"{first_col} ({note})")
+    _ui_q.put(_apply)
 
 def show_error(msg):
-    root.after(0, lambda: messagebox.showerror('エラー', msg))
+    _ui_q.put(lambda: messagebox.showerror('エラー', msg))
     update_status('エラー')
 
 def show_info(msg):
-    root.after(0, lambda: messagebox.showinfo('完了', msg))
+    _ui_q.put(lambda: messagebox.showinfo('完了', msg))
     update_status('完了')
 
-def check_thread(thread, btn):
-    if thread.is_alive():
-        root.after(100, lambda: check_thread(thread, btn))
-    else:
-        btn.config(state="normal")
-
 def run_in_thread(target_func):
     def wrapper(*args, **kwargs):
         try:
@@ -410,25 +588,128 @@ def run_in_thread(target_func):
         if btn:
             btn.config(state="disabled")
         
-        thread = threading.Thread(target=target_func, args=args, kwargs=kwargs, daemon=True)
-        thread.start()
-        
-        if btn:
-            check_thread(thread, btn)
+        _job_q.put((target_func, args, kwargs, btn))
     return wrapper
 
+threading.Thread(target=_job_worker, daemon=True).start()
+_after_ids['drain_ui'] = root.after(50, _drain_ui)
+
+# ★追加: SSH 接続は接続情報が同じ間は使い回す (鍵交換・認証を実行のたびに行わない)
+_SSH_LOCK = threading.Lock()
+_SSH_CACHE = {'key': None, 'client': None, 'last_used': 0.0}
+
+class _SharedSSHClient:
+    """
+    使い回し用 SSHClient のラッパー
+    with 文の終了・close() では切断しない (例外で抜けた場合のみ切断し、次回は再接続する)
+    """
+    def __init__(self, client): self._client = client
+    def __getattr__(self, name): return getattr(self._client, name)
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None: _drop_ssh_client(self._client)
+        return False
+    def close(self): pass
+
+def _drop_ssh_client(client):
+    with _SSH_LOCK:
+        if _SSH_CACHE['client'] is client:
+            _SSH_CACHE['key'] = _SSH_CACHE['client'] = None
+    try: client.close()
+    except Exception: pass
+
+def _ssh_alive(client):
+    # 使い回す前の死活確認 (★追加: SSH_MSG_IGNORE を送り、切断済みならここで検出)
+    transport = client.get_transport()
+    if transport is None or not transport.is_active(): return False
+    try:
+        transport.send_ignore()
+    except Exception:
+        return False
+    return True
+
 def get_ssh_client():
     ip, user, pw = v_ip.get(), v_user.get(), v_pass.get()
     if not all([ip, user, pw]):
         raise ValueError("接続情報 (IP, ユーザー, パスワード) を入力してください。")
     
+    key = (ip, user, hash(pw))  # パスワードそのものは保持しない
+    with _SSH_LOCK:
+        cached = _SSH_CACHE['client']
+        if cached is not None:
+            if _SSH_CACHE['key'] == key and _ssh_alive(cached):
+                _SSH_CACHE['last_used'] = time.monotonic()
+                return _SharedSSHClient(cached)
+            _SSH_CACHE['key'] = _SSH_CACHE['client'] = None
+            try: cached.close()
+            except Exception: pass
+        ssh = _connect_ssh(ip, user, pw)
+        _SSH_CACHE['key'], _SSH_CACHE['client'] = key, ssh
+        _SSH_CACHE['last_used'] = time.monotonic()
+        return _SharedSSHClient(ssh)
+
+def _sweep_idle_ssh():
+    # ★追加: 一定時間使われていない接続はサーバー側のセッションを残さないよう切断
+    _after_ids['sweep_ssh'] = root.after(60 * 1000, _sweep_idle_ssh)
+    with _SSH_LOCK:
+        client = _SSH_CACHE['client']
+        if client is None or time.monotonic() - _SSH_CACHE['last_used'] < SSH_IDLE_TIMEOUT: return
+    if _job_q.unfinished_tasks: return  # ジョブ実行中 (待ち含む) は切断しない
+    _drop_ssh_client(client)
+
+_after_ids['sweep_ssh'] = root.after(60 * 1000, _sweep_idle_ssh)
+
+def _connect_ssh(ip, user, pw):
+    # ★追加: Nagle無効化 & バッファ拡大したソケットを Transport に渡す (SFTP転送高速化)
+    # ★修正: getaddrinfo で解決したアドレス (IPv4/IPv6) を順に試す
+    last_err = None
+    for family, socktype, proto, _, addr in socket.getaddrinfo(ip, 22, type=socket.SOCK_STREAM):
+        sock = socket.socket(family, socktype, proto)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCK_BUF_SIZE)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCK_BUF_SIZE)
+            sock.settimeout(10)
+            sock.connect(addr)
+            break
+        except OSError as e:
+            sock.close()
+            last_err = e
+    else:
+        raise last_err
+    
     ssh = paramiko.SSHClient()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(ip, username=user, password=pw, timeout=10)
+    ssh.connect(ip, username=user, password=pw, timeout=10, sock=sock)
+    ssh.get_transport().set_keepalive(30)  # 使い回す間に切断されないよう keepalive を送る
     return ssh
 
+# ★修正: 履歴はメモリ上の hist を正とし、ファイルへは最後の更新から2秒後 (と終了時) にまとめて書き込む
+_HIST_LOCK = threading.Lock()
+_hist_dirty = False
+
+def _flush_hist(notify=True):
+    global _hist_dirty
+    with _HIST_LOCK:
+        if not _hist_dirty: return
+        # ★修正: 一時ファイルへ直接書き出してから置き換え (書き込み途中で終了しても履歴が壊れない)
+        tmp = HIST_FILE.with_suffix('.json.tmp')
+        try:
+            with tmp.open('w', encoding='utf-8', buffering=64 * 1024) as f:
+                json.dump(hist, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, HIST_FILE)
+        except OSError as e:
+            # ★追加: 書き込み失敗 (ファイルロック・容量不足など) はログに残し、未保存のまま次回に再試行する
+            log(f"[Error] History save failed: {e}")
+            if notify: messagebox.showerror('エラー', f"履歴の保存に失敗しました。\n{e}")
+            return
+        _hist_dirty = False
+
+_schedule_hist_flush = debounced(root, 2000, _flush_hist)
+atexit.register(_flush_hist, False)  # 終了時はウィンドウが無いためログのみ
+
 def save_hist():
-    hist_data = load_hist()
+    global _hist_dirty
     hist_items = {
         'ip': v_ip.get(), 'user': v_user.get(), 
         'print_ajs_path': v_print_ajs_path.get(),
@@ -439,12 +720,14 @@ def save_hist():
         'dep_tgt_files': v_dep_tgt_files.get(),
     }
     
-    for key, value in hist_items.items():
-        if not value: continue
-        new_list = [value] + [x for x in hist_data.get(key, []) if x != value]
-        hist_data[key] = new_list[:MAX_HIST]
-        
-    HIST_FILE.write_text(json.dumps(hist_data, indent=2, ensure_ascii=False), encoding='utf-8')
+    with _HIST_LOCK:
+        for key, value in hist_items.items():
+            if not value: continue
+            # 先頭に追加して重複除去 (順序は保持)
+            hist[key] = list(dict.fromkeys((value, *hist.get(key, ()))))[:MAX_HIST]
+        _hist_dirty = True
+    # save_hist はジョブのスレッドから呼ばれるため、タイマーの設定は Tk スレッドで行う
+    _ui_q.put(_schedule_hist_flush)
 
 gui_funcs_common = {
     'update_status': update_status, 
@@ -452,7 +735,9 @@ gui_funcs_common = {
     'save_hist': save_hist, 
     'show_info': show_info, 
     'show_error': show_error, 
-    'run_in_thread': run_in_thread
+    'run_in_thread': run_in_thread,
+    'set_result_text': set_result_text,
+    'set_result_rows': set_result_rows
 }
 
 def create_output_selector(parent, outc_var, outn_var):
@@ -486,14 +771,11 @@ def open_key_value_window(title, data_list, key_label, value_label):
     canvas.pack(side="left", fill="both", expand=True)
     canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
 
-    def _conf(e): canvas.configure(scrollregion=canvas.bbox("all"))
-    scroll_frame.bind("<Configure>", _conf)
+    scroll_frame.bind("<Configure>", debounced(canvas, 50, lambda: canvas.configure(scrollregion=canvas.bbox("all"))))
     
-    # キーバリューウィンドウはモーダルなので単純なbindでOK
-    def _wheel(e): 
-        if e.delta: canvas.yview_scroll(int(-1*(e.delta/120)), "units")
-    canvas.bind_all("<MouseWheel>", _wheel)
-    cust_win.bind("<Destroy>", lambda e: canvas.unbind_all("<MouseWheel>"))
+    # キーバリューウィンドウ内のホイール操作は一覧をスクロール
+    # (★修正: bind_all/unbind_all をやめる。閉じた際にメイン画面のホイール操作まで外れていた)
+    register_local_scroller(cust_win, canvas)
 
     all_rows = [] 
     def add_pair_row(key_text="", val_text=""):
@@ -547,7 +829,7 @@ t1_frm.pack(fill="x")
 t1_frm.columnconfigure(1, weight=1)
 
 ttk.Label(t1_frm, text="AJS パス").grid(row=0, column=0, sticky="e", pady=PAD_Y)
-ttk.Combobox(t1_frm, textvariable=v_print_ajs_path, values=hist.get('print_ajs_path', [])).grid(row=0, column=1, columnspan=2, sticky="ew", padx=PAD_X)
+make_hist_combobox(t1_frm, v_print_ajs_path, 'print_ajs_path').grid(row=0, column=1, columnspan=2, sticky="ew", padx=PAD_X)
 
 f_def = ttk.Frame(t1_frm)
 f_def.grid(row=2, column=1, columnspan=2, sticky="w")
@@ -587,12 +869,7 @@ for t, v in [("はい", "yes"), ("いいえ", "no")]:
 ttk.Label(t1_frm, text="銀行名").grid(row=4, column=0, sticky="ne", pady=PAD_Y)
 bank_frame = ttk.Frame(t1_frm)
 bank_frame.grid(row=4, column=1, columnspan=2, sticky="w")
-bank_rbs = []
-v_print_bank.set(BANKS[0])
-for i, b in enumerate(BANKS):
-    rb = ttk.Radiobutton(bank_frame, text=b, variable=v_print_bank, value=b, command=on_bank_select)
-    rb.grid(row=i // 5, column=i % 5, sticky="w", padx=4)
-    bank_rbs.append(rb)
+bank_rbs = make_bank_grid(bank_frame, v_print_bank, on_bank_select)
 
 ttk.Label(t1_frm, text="変換詳細").grid(row=5, column=0, sticky="ne", pady=PAD_Y)
 det_frame = ttk.Frame(t1_frm)
@@ -633,217 +910,230 @@ run_btn_print = ttk.Button(tab1, text="取得＆変換 実行", command=create_p
 run_btn_print.pack(pady=BTN_PAD_Y)
 
 
+# ★修正: Tab 2-5 の中身は初めて選択された時に作成する (起動時は Tab 1 のみ)
+run_btn_rec = run_btn_inout = run_btn_pre = run_btn_dep = None
+
 # --- Tab 2: 定義回復 ---
 tab2 = ttk.Frame(notebook, padding=10)
 notebook.add(tab2, text="定義回復")
-t2_frm = ttk.LabelFrame(tab2, text="実行設定", padding=10)
-t2_frm.pack(fill="x")
-t2_frm.columnconfigure(1, weight=1)
 
-ttk.Label(t2_frm, text="回復用AJS定義").grid(row=0, column=0, sticky="e", pady=PAD_Y)
-ttk.Entry(t2_frm, textvariable=v_recover_file).grid(row=0, column=1, sticky="ew", padx=PAD_X)
-ttk.Button(t2_frm, text="ファイル選択...", command=lambda: v_recover_file.set(filedialog.askopenfilename())).grid(row=0, column=2)
+def build_tab2():
+    global run_btn_rec
+    t2_frm = ttk.LabelFrame(tab2, text="実行設定", padding=10)
+    t2_frm.pack(fill="x")
+    t2_frm.columnconfigure(1, weight=1)
 
-ttk.Label(t2_frm, text="回復先AJSパス").grid(row=1, column=0, sticky="e", pady=PAD_Y)
-ttk.Combobox(t2_frm, textvariable=v_recover_unit, values=hist.get('recover_unit_name', [])).grid(row=1, column=1, columnspan=2, sticky="ew", padx=PAD_X)
+    ttk.Label(t2_frm, text="回復用AJS定義").grid(row=0, column=0, sticky="e", pady=PAD_Y)
+    ttk.Entry(t2_frm, textvariable=v_recover_file).grid(row=0, column=1, sticky="ew", padx=PAD_X)
+    ttk.Button(t2_frm, text="ファイル選択...", command=lambda: v_recover_file.set(filedialog.askopenfilename())).grid(row=0, column=2)
 
-def create_recover_runner():
-    gui_vars_map = {
-        'v_recover_file': v_recover_file,
-        'v_recover_unit': v_recover_unit,
-        'v_srv_c': v_srv_c, 
-        'v_ajs_define_path': v_ajs_define_path,
-        'v_jp1_hostname': v_jp1_hostname,
-        'v_jp1_username': v_jp1_username,
-    }
-    run_in_thread(define_start_job)(gui_vars_map, gui_funcs_common)
+    ttk.Label(t2_frm, text="回復先AJSパス").grid(row=1, column=0, sticky="e", pady=PAD_Y)
+    make_hist_combobox(t2_frm, v_recover_unit, 'recover_unit_name').grid(row=1, column=1, columnspan=2, sticky="ew", padx=PAD_X)
+
+    def create_recover_runner():
+        gui_vars_map = {
+            'v_recover_file': v_recover_file,
+            'v_recover_unit': v_recover_unit,
+            'v_srv_c': v_srv_c, 
+            'v_ajs_define_path': v_ajs_define_path,
+            'v_jp1_hostname': v_jp1_hostname,
+            'v_jp1_username': v_jp1_username,
+        }
+        run_in_thread(define_start_job)(gui_vars_map, gui_funcs_common)
 
-run_btn_rec = ttk.Button(tab2, text="回復実行", command=create_recover_runner)
-run_btn_rec.pack(pady=BTN_PAD_Y)
+    run_btn_rec = ttk.Button(tab2, text="回復実行", command=create_recover_runner)
+    run_btn_rec.pack(pady=BTN_PAD_Y)
 
 
 # --- Tab 3: 入出力解析 ---
 tab3 = ttk.Frame(notebook, padding=10)
 notebook.add(tab3, text="入出力解析")
 
-t3_frm = ttk.LabelFrame(tab3, text="実行設定", padding=10)
-t3_frm.pack(fill="x")
-t3_frm.columnconfigure(1, weight=1)
-
-ttk.Label(t3_frm, text="AJSパス").grid(row=0, column=0, sticky="e", pady=PAD_Y)
-ttk.Combobox(t3_frm, textvariable=v_inout_ajs, values=hist.get('inout_ajs_path', [])).grid(row=0, column=1, sticky="ew", columnspan=2, padx=PAD_X)
-
-ttk.Label(t3_frm, text="リソースパス").grid(row=1, column=0, sticky="e", pady=PAD_Y)
-ttk.Combobox(t3_frm, textvariable=v_inout_res, values=hist.get('inout_res_path', [])).grid(row=1, column=1, sticky="ew", padx=PAD_X)
-ttk.Button(t3_frm, text="参照...", command=lambda: v_inout_res.set(filedialog.askdirectory())).grid(row=1, column=2)
-
-ttk.Label(t3_frm, text="銀行名").grid(row=2, column=0, sticky="ne", pady=PAD_Y)
-t3_bank_frame = ttk.Frame(t3_frm)
-t3_bank_frame.grid(row=2, column=1, columnspan=2, sticky="w")
-v_inout_bank.set(BANKS[0])
-
-t3_custom_vars_btn = ttk.Button(t3_bank_frame, text="初期変数設定", state="disabled", command=lambda: open_key_value_window(
-    "「その他」用 初期変数設定", inout_custom_vars, "変数名 (例: BSDIR)", "値 (例: /HN)"
-))
-
-def on_t3_bank_select(*_):
-    if v_inout_bank.get() == "その他": t3_custom_vars_btn.config(state="normal")
-    else: t3_custom_vars_btn.config(state="disabled")
-
-for i, b in enumerate(BANKS):
-    row = i // 5
-    col = i % 5
-    rb = ttk.Radiobutton(t3_bank_frame, text=b, variable=v_inout_bank, value=b, command=on_t3_bank_select)
-    rb.grid(row=row, column=col, sticky="w", padx=4)
-    if b == "その他": t3_custom_vars_btn.grid(row=row, column=col + 1, sticky="w", padx=(0, 10), pady=5)
-
-ttk.Label(t3_frm, text="出力形式").grid(row=3, column=0, sticky="e", pady=PAD_Y)
-t3_out_frame = ttk.Frame(t3_frm)
-t3_out_frame.grid(row=3, column=1, columnspan=2, sticky="w")
-ttk.Radiobutton(t3_out_frame, text="Excel", variable=v_inout_format, value="Excel").pack(side="left", padx=5)
-ttk.Radiobutton(t3_out_frame, text="CSV", variable=v_inout_format, value="CSV").pack(side="left", padx=5)
-
-# ルール編集ボタンをフレーム内に配置
-ttk.Button(t3_frm, text="I/Oルール編集", command=lambda: open_editor_window(root, [b for b in BANKS if b != "その他"] + ["*"])).grid(row=3, column=2, sticky="e", padx=PAD_X)
-
-t3_res_frm = ttk.LabelFrame(tab3, text="解析結果 (問題のあったユニット一覧)", padding=10)
-t3_res_frm.pack(fill="both", expand=True, pady=(10, 0))
-
-# ★修正: create_result_textbox を使用
-t3_text_box = create_result_textbox(t3_res_frm, on_main_mousewheel, height=6)
-
-def create_inout_runner():
-    global inout_custom_vars
-    gui_vars_map = {
-        'v_inout_ajs': v_inout_ajs,
-        'v_inout_res': v_inout_res,
-        'v_ajs_print_path': v_ajs_print_path,
-        'v_inout_bank': v_inout_bank,
-        'v_inout_format': v_inout_format,
-        'v_inout_custom_vars': inout_custom_vars,
-        'v_jp1_hostname': v_jp1_hostname,
-        'v_jp1_username': v_jp1_username,
-        'inout_text_box': t3_text_box,
-    }
-    run_in_thread(inout_start_job)(gui_vars_map, gui_funcs_common)
-
-run_btn_inout = ttk.Button(tab3, text="解析実行", command=create_inout_runner)
-run_btn_inout.pack(pady=BTN_PAD_Y) 
+def build_tab3():
+    global run_btn_inout
+    t3_frm = ttk.LabelFrame(tab3, text="実行設定", padding=10)
+    t3_frm.pack(fill="x")
+    t3_frm.columnconfigure(1, weight=1)
+
+    ttk.Label(t3_frm, text="AJSパス").grid(row=0, column=0, sticky="e", pady=PAD_Y)
+    make_hist_combobox(t3_frm, v_inout_ajs, 'inout_ajs_path').grid(row=0, column=1, sticky="ew", columnspan=2, padx=PAD_X)
+
+    ttk.Label(t3_frm, text="リソースパス").grid(row=1, column=0, sticky="e", pady=PAD_Y)
+    make_hist_combobox(t3_frm, v_inout_res, 'inout_res_path').grid(row=1, column=1, sticky="ew", padx=PAD_X)
+    ttk.Button(t3_frm, text="参照...", command=lambda: v_inout_res.set(filedialog.askdirectory())).grid(row=1, column=2)
+
+    ttk.Label(t3_frm, text="銀行名").grid(row=2, column=0, sticky="ne", pady=PAD_Y)
+    t3_bank_frame = ttk.Frame(t3_frm)
+    t3_bank_frame.grid(row=2, column=1, columnspan=2, sticky="w")
+
+    t3_custom_vars_btn = ttk.Button(t3_bank_frame, text="初期変数設定", state="disabled", command=lambda: open_key_value_window(
+        "「その他」用 初期変数設定", inout_custom_vars, "変数名 (例: BSDIR)", "値 (例: /HN)"
+    ))
+
+    def on_t3_bank_select(*_):
+        if v_inout_bank.get() == "その他": t3_custom_vars_btn.config(state="normal")
+        else: t3_custom_vars_btn.config(state="disabled")
+
+    make_bank_grid(t3_bank_frame, v_inout_bank, on_t3_bank_select)
+    row, col = bank_cell_after("その他")
+    t3_custom_vars_btn.grid(row=row, column=col, sticky="w", padx=(0, 10), pady=5)
+
+    ttk.Label(t3_frm, text="出力形式").grid(row=3, column=0, sticky="e", pady=PAD_Y)
+    t3_out_frame = ttk.Frame(t3_frm)
+    t3_out_frame.grid(row=3, column=1, columnspan=2, sticky="w")
+    ttk.Radiobutton(t3_out_frame, text="Excel", variable=v_inout_format, value="Excel").pack(side="left", padx=5)
+    ttk.Radiobutton(t3_out_frame, text="CSV", variable=v_inout_format, value="CSV").pack(side="left", padx=5)
+
+    # ルール編集ボタンをフレーム内に配置
+    ttk.Button(t3_frm, text="I/Oルール編集", command=lambda: open_editor_window(root, [b for b in BANKS if b != "その他"] + ["*"])).grid(row=3, column=2, sticky="e", padx=PAD_X)
+
+    t3_res_frm = ttk.LabelFrame(tab3, text="解析結果 (問題のあったユニット一覧)", padding=10)
+    t3_res_frm.pack(fill="both", expand=True, pady=(10, 0))
+
+    # ★修正: 問題ユニットは (ユニット, 備考) の表なので Treeview で表示
+    t3_text_box = create_result_tree(t3_res_frm, height=6, columns=("ユニット完全名称", "備考 (取得方法)"))
+
+    def create_inout_runner():
+        global inout_custom_vars
+        gui_vars_map = {
+            'v_inout_ajs': v_inout_ajs,
+            'v_inout_res': v_inout_res,
+            'v_ajs_print_path': v_ajs_print_path,
+            'v_inout_bank': v_inout_bank,
+            'v_inout_format': v_inout_format,
+            'v_inout_custom_vars': inout_custom_vars,
+            'v_jp1_hostname': v_jp1_hostname,
+            'v_jp1_username': v_jp1_username,
+            'inout_text_box': t3_text_box,
+        }
+        run_in_thread(inout_start_job)(gui_vars_map, gui_funcs_common)
+
+    run_btn_inout = ttk.Button(tab3, text="解析実行", command=create_inout_runner)
+    run_btn_inout.pack(pady=BTN_PAD_Y) 
 
 
 # --- Tab 4: 先行関係解析 ---
 tab4 = ttk.Frame(notebook, padding=10)
 notebook.add(tab4, text="先行関係解析")
 
-t4_frm = ttk.LabelFrame(tab4, text="実行設定", padding=10)
-t4_frm.pack(fill="x")
-t4_frm.columnconfigure(1, weight=1)
+def build_tab4():
+    global run_btn_pre
+    t4_frm = ttk.LabelFrame(tab4, text="実行設定", padding=10)
+    t4_frm.pack(fill="x")
+    t4_frm.columnconfigure(1, weight=1)
 
-ttk.Label(t4_frm, text="AJSパス").grid(row=0, column=0, sticky="e", pady=PAD_Y)
-ttk.Combobox(t4_frm, textvariable=v_pre_root, values=hist.get('pre_root', [])).grid(row=0, column=1, sticky="ew", padx=PAD_X)
+    ttk.Label(t4_frm, text="AJSパス").grid(row=0, column=0, sticky="e", pady=PAD_Y)
+    make_hist_combobox(t4_frm, v_pre_root, 'pre_root').grid(row=0, column=1, sticky="ew", padx=PAD_X)
 
-ttk.Label(t4_frm, text="解析対象ユニットパス").grid(row=1, column=0, sticky="e", pady=PAD_Y)
-ttk.Combobox(t4_frm, textvariable=v_pre_tgt, values=hist.get('pre_tgt', [])).grid(row=1, column=1, sticky="ew", padx=PAD_X)
+    ttk.Label(t4_frm, text="解析対象ユニットパス").grid(row=1, column=0, sticky="e", pady=PAD_Y)
+    make_hist_combobox(t4_frm, v_pre_tgt, 'pre_tgt').grid(row=1, column=1, sticky="ew", padx=PAD_X)
 
-create_output_selector(tab4, v_pre_out_c, v_pre_out_n).pack(fill="x", pady=5, expand=True)
+    create_output_selector(tab4, v_pre_out_c, v_pre_out_n).pack(fill="x", pady=5, expand=True)
 
-t4_res_frm = ttk.LabelFrame(tab4, text="解析結果 (関連ユニット一覧)", padding=10)
-t4_res_frm.pack(fill="both", expand=True)
+    t4_res_frm = ttk.LabelFrame(tab4, text="解析結果 (関連ユニット一覧)", padding=10)
+    t4_res_frm.pack(fill="both", expand=True)
 
-# ★修正: create_result_textbox を使用
-t4_text_box = create_result_textbox(t4_res_frm, on_main_mousewheel, height=10)
+    # ★修正: タブを初めて開くまで Text を作らない
+    t4_text_box = LazyResultTextbox(t4_res_frm, height=10)
 
-def create_pre_runner():
-    gui_vars_map = {
-        'v_pre_root': v_pre_root,
-        'v_pre_tgt': v_pre_tgt,
-        'v_srv_c': v_srv_c,
-        'v_pre_out_c': v_pre_out_c,
-        'v_pre_out_n': v_pre_out_n,
-        'v_ajs_print_path': v_ajs_print_path,
-        'v_jp1_hostname': v_jp1_hostname,
-        'v_jp1_username': v_jp1_username,
-    }
-    run_in_thread(pre_start_job)(gui_vars_map, gui_funcs_common, t4_text_box)
+    def create_pre_runner():
+        gui_vars_map = {
+            'v_pre_root': v_pre_root,
+            'v_pre_tgt': v_pre_tgt,
+            'v_srv_c': v_srv_c,
+            'v_pre_out_c': v_pre_out_c,
+            'v_pre_out_n': v_pre_out_n,
+            'v_ajs_print_path': v_ajs_print_path,
+            'v_jp1_hostname': v_jp1_hostname,
+            'v_jp1_username': v_jp1_username,
+        }
+        run_in_thread(pre_start_job)(gui_vars_map, gui_funcs_common, t4_text_box)
 
-run_btn_pre = ttk.Button(tab4, text="解析実行", command=create_pre_runner)
-run_btn_pre.pack(pady=BTN_PAD_Y)
+    run_btn_pre = ttk.Button(tab4, text="解析実行", command=create_pre_runner)
+    run_btn_pre.pack(pady=BTN_PAD_Y)
 
 
 # --- Tab 5: 依存関係解析 ---
 tab5 = ttk.Frame(notebook, padding=10)
 notebook.add(tab5, text="依存関係解析")
 
-t5_frm = ttk.LabelFrame(tab5, text="実行設定", padding=10)
-t5_frm.pack(fill="x")
-t5_frm.columnconfigure(1, weight=1)
+def build_tab5():
+    global run_btn_dep
+    t5_frm = ttk.LabelFrame(tab5, text="実行設定", padding=10)
+    t5_frm.pack(fill="x")
+    t5_frm.columnconfigure(1, weight=1)
 
-ttk.Label(t5_frm, text="AJSパス").grid(row=0, column=0, sticky="e", pady=PAD_Y)
-ttk.Combobox(t5_frm, textvariable=v_dep_ajs, values=hist.get('dep_ajs_path', [])).grid(row=0, column=1, sticky="ew", padx=PAD_X)
+    ttk.Label(t5_frm, text="AJSパス").grid(row=0, column=0, sticky="e", pady=PAD_Y)
+    make_hist_combobox(t5_frm, v_dep_ajs, 'dep_ajs_path').grid(row=0, column=1, sticky="ew", padx=PAD_X)
 
-ttk.Label(t5_frm, text="リソースパス").grid(row=1, column=0, sticky="e", pady=PAD_Y)
-ttk.Combobox(t5_frm, textvariable=v_dep_res, values=hist.get('dep_res_path', [])).grid(row=1, column=1, sticky="ew", padx=PAD_X)
-ttk.Button(t5_frm, text="参照...", command=lambda: v_dep_res.set(filedialog.askdirectory())).grid(row=1, column=2)
+    ttk.Label(t5_frm, text="リソースパス").grid(row=1, column=0, sticky="e", pady=PAD_Y)
+    make_hist_combobox(t5_frm, v_dep_res, 'dep_res_path').grid(row=1, column=1, sticky="ew", padx=PAD_X)
+    ttk.Button(t5_frm, text="参照...", command=lambda: v_dep_res.set(filedialog.askdirectory())).grid(row=1, column=2)
 
-ttk.Label(t5_frm, text="銀行名").grid(row=2, column=0, sticky="ne", pady=PAD_Y)
-t5_bank_frame = ttk.Frame(t5_frm)
-t5_bank_frame.grid(row=2, column=1, columnspan=2, sticky="w")
-v_dep_bank.set(BANKS[0])
+    ttk.Label(t5_frm, text="銀行名").grid(row=2, column=0, sticky="ne", pady=PAD_Y)
+    t5_bank_frame = ttk.Frame(t5_frm)
+    t5_bank_frame.grid(row=2, column=1, columnspan=2, sticky="w")
 
-t5_custom_vars_btn = ttk.Button(t5_bank_frame, text="初期変数設定", state="disabled", command=lambda: open_key_value_window(
-    "「その他」用 初期変数設定", dep_custom_vars, "変数名 (例: BSDIR)", "値 (例: /HN)"
-))
+    t5_custom_vars_btn = ttk.Button(t5_bank_frame, text="初期変数設定", state="disabled", command=lambda: open_key_value_window(
+        "「その他」用 初期変数設定", dep_custom_vars, "変数名 (例: BSDIR)", "値 (例: /HN)"
+    ))
 
-def on_t5_bank_select(*_):
-    if v_dep_bank.get() == "その他": t5_custom_vars_btn.config(state="normal")
-    else: t5_custom_vars_btn.config(state="disabled")
+    def on_t5_bank_select(*_):
+        if v_dep_bank.get() == "その他": t5_custom_vars_btn.config(state="normal")
+        else: t5_custom_vars_btn.config(state="disabled")
 
-for i, b in enumerate(BANKS):
-    row = i // 5
-    col = i % 5
-    rb = ttk.Radiobutton(t5_bank_frame, text=b, variable=v_dep_bank, value=b, command=on_t5_bank_select)
-    rb.grid(row=row, column=col, sticky="w", padx=4)
-    if b == "その他": t5_custom_vars_btn.grid(row=row, column=col + 1, sticky="w", padx=(0, 10))
+    make_bank_grid(t5_bank_frame, v_dep_bank, on_t5_bank_select)
+    row, col = bank_cell_after("その他")
+    t5_custom_vars_btn.grid(row=row, column=col, sticky="w", padx=(0, 10))
 
-lbl_files = ttk.Label(t5_frm, text="目標ファイル")
-lbl_files.grid(row=3, column=0, sticky="ne", pady=PAD_Y)
+    lbl_files = ttk.Label(t5_frm, text="目標ファイル")
+    lbl_files.grid(row=3, column=0, sticky="ne", pady=PAD_Y)
 
-# リストエディタ
-t5_list_editor = FileListEditor(t5_frm, on_main_mousewheel)
-t5_list_editor.grid(row=3, column=1, columnspan=2, sticky="ew", padx=5, pady=3)
+    # リストエディタ
+    t5_list_editor = FileListEditor(t5_frm)
+    t5_list_editor.grid(row=3, column=1, columnspan=2, sticky="ew", padx=5, pady=3)
 
-# Tab5初期値は常に空
-t5_list_editor.set_values([])
+    # Tab5初期値は常に空
+    t5_list_editor.set_values([])
 
-create_output_selector(tab5, v_dep_out_c, v_dep_out_n).pack(fill="x", pady=5, expand=True)
+    create_output_selector(tab5, v_dep_out_c, v_dep_out_n).pack(fill="x", pady=5, expand=True)
 
-t5_res_frm = ttk.LabelFrame(tab5, text="解析結果 (抽出ユニットと外部入力ファイル一覧)", padding=10)
-t5_res_frm.pack(fill="both", expand=True)
+    t5_res_frm = ttk.LabelFrame(tab5, text="解析結果 (抽出ユニットと外部入力ファイル一覧)", padding=10)
+    t5_res_frm.pack(fill="both", expand=True)
 
-# ★修正: create_result_textbox を使用
-t5_text_box = create_result_textbox(t5_res_frm, on_main_mousewheel, height=10)
+    # ★修正: タブを初めて開くまで Text を作らない
+    t5_text_box = LazyResultTextbox(t5_res_frm, height=10)
 
-def create_dep_runner():
-    global dep_custom_vars
-    file_list = t5_list_editor.get_values()
-    v_dep_tgt_files.set("\n".join(file_list))
-    
-    gui_vars_map = {
-        'v_dep_ajs': v_dep_ajs,
-        'v_dep_res': v_dep_res,
-        'v_dep_tgt_files': v_dep_tgt_files,
-        'v_dep_bank': v_dep_bank,
-        'v_dep_custom_vars': dep_custom_vars,
-        'v_t5_out_c': v_dep_out_c,
-        'v_t5_out_n': v_dep_out_n, 
-        'v_ajs_print_path': v_ajs_print_path,
-        'v_jp1_hostname': v_jp1_hostname,
-        'v_jp1_username': v_jp1_username,
-    }
-    open_t5_job_runner(gui_vars_map, gui_funcs_common, t5_text_box)
+    def create_dep_runner():
+        global dep_custom_vars
+        file_list = t5_list_editor.get_values()
+        v_dep_tgt_files.set("\n".join(file_list))
+
+        gui_vars_map = {
+            'v_dep_ajs': v_dep_ajs,
+            'v_dep_res': v_dep_res,
+            'v_dep_tgt_files': v_dep_tgt_files,
+            'v_dep_bank': v_dep_bank,
+            'v_dep_custom_vars': dep_custom_vars,
+            'v_t5_out_c': v_dep_out_c,
+            'v_t5_out_n': v_dep_out_n, 
+            'v_ajs_print_path': v_ajs_print_path,
+            'v_jp1_hostname': v_jp1_hostname,
+            'v_jp1_username': v_jp1_username,
+        }
+        open_t5_job_runner(gui_vars_map, gui_funcs_common, t5_text_box)
+
+    run_btn_dep = ttk.Button(tab5, text="解析＆定義作成 実行", command=create_dep_runner)
+    run_btn_dep.pack(pady=BTN_PAD_Y)
 
-run_btn_dep = ttk.Button(tab5, text="解析＆定義作成 実行", command=create_dep_runner)
-run_btn_dep.pack(pady=BTN_PAD_Y)
+
+_TAB_BUILDERS = {tab2: build_tab2, tab3: build_tab3, tab4: build_tab4, tab5: build_tab5}
+
+def on_tab_changed(event=None):
+    builder = _TAB_BUILDERS.pop(notebook.nametowidget(notebook.select()), None)
+    if builder is not None: builder()
+
+notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
 
 
 # --- 共通ステータスバー ---
@@ -852,5 +1142,26 @@ status_frm.pack(fill="x", side="bottom", pady=(10, 0))
 ttk.Progressbar(status_frm, variable=progress, maximum=100, length=260, mode='determinate').pack(fill="x")
 ttk.Label(status_frm, textvariable=status_var).pack(fill="x", pady=(2, 0))
 
+def _on_close():
+    # ★追加: 定期処理を止めてから閉じる (ジョブ用スレッドは daemon のため終了を待たない)
+    for after_id in _after_ids.values():
+        try: root.after_cancel(after_id)
+        except tk.TclError: pass
+    _after_ids.clear()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", _on_close)
+
+def _preload_file_dialogs():
+    # ★追加: X11 のファイル選択ダイアログ (Tcl スクリプト) を起動後の空き時間に読み込んでおき、初回クリック時の待ちをなくす
+    # (Windows はネイティブダイアログのため対象外)
+    for proc in ('::tk::dialog::file::Config', '::tk::dialog::file::chooseDir::Config'):
+        try: root.tk.call('auto_load', proc)
+        except tk.TclError: pass
+
+if not _IS_WINDOWS:
+    root.after_idle(_preload_file_dialogs)
+
 if __name__ == '__main__':
     root.mainloop()
+    if _SSH_CACHE['client'] is not None: _drop_ssh_client(_SSH_CACHE['client'])
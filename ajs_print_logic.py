@@ -6,23 +6,35 @@ v3.5 (2025-11-23) - フォルダ構成変更 (中間ファイルはtmpへ、成
 """
 
 import os
+import re
 import sys
 import time
 import shlex
 import csv
 import codecs
+import pickle
 import pathlib
 import traceback
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from ajs_constants import ENC, NL, PARAM_FILE, DIR_NAME_PRINT, LOG_DIR
+from ajs_common import enlarge_sftp_window, sftp_download
 
 LOG_FILE = LOG_DIR / "tab1_print_debug.log"
+# パラメータファイルの解析結果キャッシュ (パス・更新日時・サイズが同じなら再解析しない)
+PRM_CACHE_FILE = LOG_DIR / "prm_cache.pkl"
+
+# ジョブ実行中のみ開いておくログファイル (1行ごとの open/close を回避)
+_LOG_FH = None
 
 def _log(msg):
     try:
-        timestamp = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-        with open(LOG_FILE, "a", encoding="utf-8") as f: f.write(f"[{timestamp}] {msg}\n")
+        timestamp = time.strftime("%Y/%m/%d %H:%M:%S")
+        line = f"[{timestamp}] {msg}\n"
+        if _LOG_FH is not None: _LOG_FH.write(line)
+        else:
+            with open(LOG_FILE, "a", encoding="utf-8") as f: f.write(line)
     except: pass
 
 def print_load_prm(path):
@@ -37,6 +49,26 @@ def print_load_prm(path):
             mp.setdefault(bank, []).append({'prod': prod, 'mir': mir, 'dev': dev})
     return mp
 
+def _load_prm_cached(path):
+    """★追加: print_load_prm の結果を PRM_CACHE_FILE にキャッシュする"""
+    if not os.path.exists(path): raise FileNotFoundError(f"パラメータファイルが見つかりません: {path}")
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    try:
+        with open(PRM_CACHE_FILE, "rb") as f:
+            cached_key, mp = pickle.load(f)
+        if cached_key == key: return mp
+    except Exception: pass
+    mp = print_load_prm(path)
+    try:
+        tmp = PRM_CACHE_FILE.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((key, mp), f, protocol=5)
+        os.replace(tmp, PRM_CACHE_FILE)
+    except Exception as e:
+        _log(f"[Warning] Param cache save error: {e}")
+    return mp
+
 def print_build_table(mapping, bank, detail):
     tbl = []
     details_map = {
@@ -51,6 +83,31 @@ def print_build_table(mapping, bank, detail):
         if src_val and dst_val: tbl.append((src_val, dst_val))
     return tbl
 
+def print_build_replacer(table):
+    """
+    ★追加: 変換テーブルの全ペアを1回の走査で置換する関数を返す
+    (同じ位置で複数の変換元が一致する場合は長い方を優先。同じ変換元が複数ある場合は先の行を採用)
+    """
+    lookup = {}
+    for src, dst in table:
+        if src: lookup.setdefault(src, dst)
+    if not lookup: return lambda txt: txt
+    if all(len(src) == 1 for src in lookup):
+        trans = str.maketrans(lookup)
+        return lambda txt: txt.translate(trans)
+    pattern = re.compile('|'.join(map(re.escape, sorted(lookup, key=len, reverse=True))))
+    repl = lambda m: lookup[m.group(0)]
+    return lambda txt: pattern.sub(repl, txt)
+
+def _convert_one(path, convert, srv_enc, out_c, out_n, out_dir):
+    """1ファイル分の変換。変換後のファイルは常にルート(out_dir)に保存し、そのパスを返す"""
+    conv_path = out_dir / f"{path.stem}_converted.txt"
+    # ★修正: 全文を読み込まず1行ずつ変換して書き出す (変換元・先は改行を含まない)
+    with open(path, 'r', encoding=srv_enc, errors='ignore') as fin, \
+         open(conv_path, 'w', encoding=out_c, newline=out_n, errors='ignore', buffering=1 << 20) as fout:
+        fout.writelines(map(convert, fin))
+    return conv_path
+
 def print_start_job(gui_vars, gui_funcs):
     update_status = gui_funcs['update_status']
     get_ssh_client = gui_funcs['get_ssh_client']
@@ -58,8 +115,10 @@ def print_start_job(gui_vars, gui_funcs):
     show_info = gui_funcs['show_info']
     show_error = gui_funcs['show_error']
     
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        f.write(f"=== Tab 1 (Print) Execution Start: {datetime.datetime.now()} ===\n")
+    global _LOG_FH
+    # ★修正: ジョブ終了までファイルを開いたままバッファ書き込み
+    _LOG_FH = open(LOG_FILE, "w", encoding="utf-8", buffering=1 << 16)
+    _LOG_FH.write(f"=== Tab 1 (Print) Execution Start: {datetime.datetime.now()} ===\n")
 
     try:
         v_ajs_path = gui_vars['v_print_ajs_path']
@@ -118,30 +177,40 @@ def print_start_job(gui_vars, gui_funcs):
         srv_enc = ENC[v_srv_c.get()]
         
         with get_ssh_client() as ssh:
+            enlarge_sftp_window(ssh)
             sftp = ssh.open_sftp()
             local_files = []
-            for i, (fname, rtmp, cmd) in enumerate(cmd_list):
-                progress_val = 20 + i * 30
-                update_status(f"{fname} 取得中...", progress_val)
-                ch = ssh.get_transport().open_session()
-                ch.exec_command(cmd.encode(srv_enc))
-                if ch.recv_exit_status() != 0:
-                    err_msg = ch.makefile_stderr().read().decode(srv_enc,'ignore')
-                    _log(f"[Error] Command failed: {err_msg}")
-                    raise RuntimeError(f"コマンド実行エラー:\n{err_msg}")
-                
-                # ★修正: 変換ありならtmpへ、なしならrootへ保存
-                if v_conv_flg.get() == "yes":
-                    lpath = tmp_dir / fname
-                else:
-                    lpath = out_dir / fname
+            # ★修正: コマンドは先にすべて実行開始し、先頭から順に終了を待ってダウンロード (後続コマンドの実行中に前のファイルを取得)
+            channels = []
+            try:
+                for fname, rtmp, cmd in cmd_list:
+                    ch = ssh.get_transport().open_session()
+                    ch.exec_command(cmd.encode(srv_enc))
+                    channels.append(ch)
+                for i, ((fname, rtmp, cmd), ch) in enumerate(zip(cmd_list, channels)):
+                    progress_val = 20 + i * 30
+                    update_status(f"{fname} 取得中...", progress_val)
+                    if ch.recv_exit_status() != 0:
+                        err_msg = ch.makefile_stderr().read().decode(srv_enc,'ignore')
+                        _log(f"[Error] Command failed: {err_msg}")
+                        raise RuntimeError(f"コマンド実行エラー:\n{err_msg}")
                     
-                update_status(f"{fname} ダウンロード中...", progress_val + 15)
-                sftp.get(rtmp, str(lpath))
-                local_files.append(lpath)
-                try: ssh.exec_command(f"rm -f {rtmp}")
+                    # ★修正: 変換ありならtmpへ、なしならrootへ保存
+                    if v_conv_flg.get() == "yes":
+                        lpath = tmp_dir / fname
+                    else:
+                        lpath = out_dir / fname
+                        
+                    update_status(f"{fname} ダウンロード中...", progress_val + 15)
+                    sftp_download(sftp, rtmp, lpath)
+                    local_files.append(lpath)
+            finally:
+                # ★修正: 失敗時も含め、チャネルを閉じてリモートの一時ファイルをまとめて削除
+                #        (先のコマンドが失敗しても、後続コマンドは既に一時ファイルを作っているため)
+                for ch in channels: ch.close()
+                sftp.close()
+                try: ssh.exec_command("rm -f " + " ".join(shlex.quote(rtmp) for _, rtmp, _ in cmd_list))
                 except: pass
-            sftp.close()
 
             out_c, out_n = ENC[v_out_c.get()], NL[v_out_n.get()]
             prm_path = base_dir / PARAM_FILE
@@ -155,24 +224,19 @@ def print_start_job(gui_vars, gui_funcs):
                     if not custom_pairs: raise ValueError("カスタム変換が選択されましたが、詳細が1件も登録されていません。")
                     table = custom_pairs
                 else:
-                    mapping = print_load_prm(prm_path)
+                    mapping = _load_prm_cached(prm_path)
                     table = print_build_table(mapping, v_bank_sel.get(), detail_selection)
 
                 if not table:
                     update_status("変換テーブルが空のためスキップ", 85)
                     _log("[Info] Conversion table is empty. Skipping.")
                 else:
-                    for path in local_files:
-                        txt = path.read_text(encoding=srv_enc, errors='ignore')
-                        for src, dst in table:
-                            if src: txt = txt.replace(src, dst)
-                        
-                        # ★修正: 変換後のファイルは常にルート(out_dir)に保存
-                        conv_fname = f"{path.stem}_converted.txt"
-                        conv_path = out_dir / conv_fname
-                        
-                        conv_path.write_text(txt, encoding=out_c, newline=out_n, errors='ignore')
-                        _log(f"[Info] Converted file saved: {conv_path.name}")
+                    convert = print_build_replacer(table)
+                    # ★修正: recover/verify の両方を取得した場合は2ファイルを並行して変換 (ログは取得順)
+                    with ThreadPoolExecutor(max_workers=len(local_files)) as ex:
+                        conv_paths = ex.map(lambda p: _convert_one(p, convert, srv_enc, out_c, out_n, out_dir), local_files)
+                        for conv_path in conv_paths:
+                            _log(f"[Info] Converted file saved: {conv_path.name}")
         
         update_status("完了", 100)
         save_hist()
@@ -186,3 +250,5 @@ def print_start_job(gui_vars, gui_funcs):
         show_error(err_detail)
     finally:
         update_status("待機中", 0)
+        _LOG_FH.close()
+        _LOG_FH = None
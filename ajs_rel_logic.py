@@ -14,67 +14,82 @@ import pathlib
 import networkx as nx
 import json 
 import collections
+import heapq
 import traceback
 import datetime
 
 # 定数ファイルをインポート
-from ajs_constants import ENC, NL, LOG_DIR, DIR_NAME_PRE
+from ajs_constants import ENC, NL, LOG_DIR, DIR_NAME_PRE, RESULT_DISPLAY_MAX
+from ajs_common import ORJSON_AVAILABLE, orjson, json_default, enlarge_sftp_window, sftp_download
 
 # ログファイルパス
 LOG_FILE_RUN = LOG_DIR / "tab4_pre_run.log"
 LOG_FILE_DETAIL = LOG_DIR / "tab4_pre_details.json"
 
+# ジョブ実行中のみ開いておくログファイル (1行ごとの open/close を回避)
+_LOG_FH = None
+
 def _log(msg):
     """実行ログへの書き込みヘルパー"""
     try:
-        timestamp = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-        with open(LOG_FILE_RUN, "a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] {msg}\n")
+        timestamp = time.strftime("%Y/%m/%d %H:%M:%S")
+        line = f"[{timestamp}] {msg}\n"
+        if _LOG_FH is not None:
+            _LOG_FH.write(line)
+        else:
+            with open(LOG_FILE_RUN, "a", encoding="utf-8") as f:
+                f.write(line)
     except: pass
 
 def write_detail_log(data_dict):
     """詳細ログ(JSON)出力"""
     try:
-        # Set型をListに変換してJSON化
-        serializable = {}
-        for k, v in data_dict.items():
-            if isinstance(v, set):
-                serializable[k] = sorted(list(v))
-            elif isinstance(v, list):
-                serializable[k] = v
-            else:
-                serializable[k] = str(v)
-                
-        with open(LOG_FILE_DETAIL, "w", encoding="utf-8") as f:
-            json.dump(serializable, f, indent=2, ensure_ascii=False)
+        # ★修正: 事前のコピー・変換をやめ、シリアライズ時に default で Set 等を変換 (件数は数値のまま出力)
+        if ORJSON_AVAILABLE:
+            LOG_FILE_DETAIL.write_bytes(orjson.dumps(data_dict, option=orjson.OPT_INDENT_2, default=json_default))
+        else:
+            # indent 指定時は C 実装のエンコーダが使われないため、標準 json では詰めて出力
+            with open(LOG_FILE_DETAIL, "w", encoding="utf-8") as f:
+                json.dump(data_dict, f, ensure_ascii=False, separators=(',', ':'), default=json_default)
         _log(f"[Info] Detail log saved: {LOG_FILE_DETAIL}")
     except Exception as e:
         _log(f"[Error] Failed to write detail log: {e}")
 
+_ROOT_PREFIX_RE = re.compile(r'^[a-zA-Z0-9_]+:')
+_UNIT_TYPES = frozenset("mgroup,group,mnet,condn,net,rnet,rmnet,rrnet,job,rjob,pjob,rpjob,qjob,rqjob,jdjob,rjdjob,orjob,rorjob,fxjob,rfxjob,netcn".split(','))
+
 def pre_normalize(path: str, base: str) -> str:
     """AJSパスを正規化する"""
-    p = re.sub(r'^[a-zA-Z0-9_]+:', '', path.strip())
-    if base and base != "/" and p.startswith(base):
-        p = p.replace(base, '', 1)
+    p = path.strip()
+    # ★修正: 'AJSROOT1:' 形式の接頭辞は先頭の match だけで判定し、base は removeprefix で外す
+    m = _ROOT_PREFIX_RE.match(p)
+    if m: p = p[m.end():]
+    if base and base != "/": p = p.removeprefix(base)
     return p
 
+def _join_path(parent, child):
+    # ★修正: 親は末尾 '/' を落とし、子はユニット名 ('/' を含まない) のため '//' は生じない
+    return f"{parent.rstrip('/')}/{child}"
+
 def pre_parse_graph(txt: str, base: str):
     """3つ組 (From, To, Type) 対応のグラフ構築"""
     G = nx.DiGraph()
-    unit_types = {x.strip() for x in "mgroup,group,mnet,condn,net,rnet,rmnet,rrnet,job,rjob,pjob,rpjob,qjob,rqjob,jdjob,rjdjob,orjob,rorjob,fxjob,rfxjob,netcn".split(',')}
+    unit_types = _UNIT_TYPES
+    # ★修正: ノード・辺はリストに集めて最後にまとめて追加 (追加順は従来と同じ)
+    nodes, edges = [], []
+    add_node, add_edge = nodes.append, edges.append
+    n_units = 0
     
     current_parent = None
-    parse_stats = {"nodes": 0, "edges": 0}
 
     for ln in txt.splitlines():
         cols = ln.split('\t')
-        if not cols: continue
         
         if cols[0] in unit_types and len(cols) >= 2:
             current_parent = pre_normalize(cols[1], base)
             if current_parent.strip('/'):
-                G.add_node(current_parent)
-                parse_stats["nodes"] += 1
+                add_node(current_parent)
+                n_units += 1
             rels_str = cols[2] if len(cols) >= 3 else ""
         else:
             rels_str = cols[0]
@@ -89,30 +104,41 @@ def pre_parse_graph(txt: str, base: str):
             
             if from_name == '-' or to_name == '-': continue
 
-            def join_path(parent, child):
-                return f"{parent.rstrip('/')}/{child}".replace("//", "/")
-
-            from_path = join_path(current_parent, from_name)
-            to_path = join_path(current_parent, to_name)
+            from_path = _join_path(current_parent, from_name)
+            to_path = _join_path(current_parent, to_name)
 
             if from_path.strip('/') and to_path.strip('/'):
-                G.add_node(from_path)
-                G.add_node(to_path)
-                G.add_edge(from_path, to_path)
-                parse_stats["edges"] += 1
+                add_node(from_path)
+                add_node(to_path)
+                add_edge((from_path, to_path))
 
-    _log(f"[Graph] Parsed {parse_stats['nodes']} nodes, {parse_stats['edges']} edges.")
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
+    _log(f"[Graph] Parsed {n_units} nodes, {len(edges)} edges.")
     return G
 
-def pre_descendants(G: nx.DiGraph, n):
-    """指定ノード配下の子孫ユニットをすべて列挙する"""
-    prefix = n.rstrip('/') + '/'
-    yield from (x for x in G.nodes if x.startswith(prefix) and x != n)
+def _build_descendant_index(G: nx.DiGraph):
+    """
+    ★追加: パスの各 '/' より前の部分 -> その配下のユニット一覧 の索引を1回だけ作る
+    (途中の階層がグラフに無い場合も、上位のどの階層からも引けるようにする)
+    """
+    index = collections.defaultdict(list)
+    for x in G.nodes:
+        i = x.find('/')
+        while i >= 0:
+            index[x[:i]].append(x)
+            i = x.find('/', i + 1)
+    return index
+
+def pre_descendants(index, n):
+    """指定ノード配下の子孫ユニットをすべて列挙する (★修正: 全ノード走査ではなく索引から引く)"""
+    return [x for x in index.get(n.rstrip('/'), ()) if x != n]
 
 def pre_compute_need(G: nx.DiGraph, target: str):
     """指定ユニットの実行に必要な先行ユニット・親・子孫をすべて計算する"""
     need = set()
     q = [(target, 'seed')]
+    desc_index = _build_descendant_index(G)
     
     while q:
         n, org = q.pop()
@@ -123,19 +149,18 @@ def pre_compute_need(G: nx.DiGraph, target: str):
         need.add(n)
         
         # 1. 先行ユニット
-        if n in G:
-            q.extend((p, 'pre') for p in G.predecessors(n))
+        q.extend((p, 'pre') for p in G.predecessors(n))
         
-        # 2. 親ユニット
-        anc = n
-        while '/' in anc.strip('/'):
-            anc = '/' + '/'.join(anc.strip('/').split('/')[:-1])
-            if not anc.strip('/'): break
-            q.append((anc, 'par'))
+        # 2. 親ユニット (★修正: 分割・連結し直さず、末尾の1階層ずつ rsplit で外す)
+        anc = n.strip('/')
+        while '/' in anc:
+            anc = anc.rsplit('/', 1)[0]
+            q.append(('/' + anc, 'par'))
+            anc = anc.strip('/')
             
         # 3. 子孫ユニット
         if org in ('seed', 'pre'):
-            q.extend((d, 'desc') for d in pre_descendants(G, n))
+            q.extend((d, 'desc') for d in pre_descendants(desc_index, n))
             
     return need
 
@@ -143,11 +168,11 @@ def find_bridged_successors(G: nx.DiGraph, start_node: str, valid_siblings: set)
     """グラフ探索: 直近の有効な兄弟を探す"""
     targets = set()
     visited = set()
-    queue = [start_node]
+    queue = collections.deque([start_node])  # ★修正: list.pop(0) は O(n) のため deque を使用
     visited.add(start_node)
     
     while queue:
-        curr = queue.pop(0)
+        curr = queue.popleft()
         if curr not in G: continue
         
         for succ in G.successors(curr):
@@ -160,24 +185,69 @@ def find_bridged_successors(G: nx.DiGraph, start_node: str, valid_siblings: set)
                 queue.append(succ)
     return targets
 
+def _bridged_successor_map(G: nx.DiGraph, starts, valid_siblings: set):
+    """
+    ★追加: find_bridged_successors を starts の全ノード分まとめて計算する
+    有効な兄弟以外のノードごとに「そこから到達する直近の有効な兄弟」を1回だけ求めて共有する
+    (経由ノードに循環がある場合は None を返す → 呼び出し側で従来の探索を使用)
+    """
+    reach = {}  # 有効な兄弟以外のノード -> 到達する直近の有効な兄弟 (frozenset)
+    on_path = set()
+
+    def resolve(root):
+        # 帰りがけ順で reach を埋める (再帰の深さ制限を避けるためスタックで処理)
+        stack = [(root, iter(G.successors(root)))]
+        on_path.add(root)
+        while stack:
+            node, it = stack[-1]
+            for succ in it:
+                if succ in valid_siblings or succ in reach: continue
+                if succ in on_path: return False
+                on_path.add(succ)
+                stack.append((succ, iter(G.successors(succ))))
+                break
+            else:
+                stack.pop()
+                on_path.discard(node)
+                found = set()
+                for succ in G.successors(node):
+                    if succ in valid_siblings: found.add(succ)
+                    else: found |= reach[succ]
+                reach[node] = frozenset(found)
+        return True
+
+    result = {}
+    for start in starts:
+        if start not in G: continue
+        targets = set()
+        for succ in G.successors(start):
+            if succ in valid_siblings:
+                targets.add(succ)
+                continue
+            if succ not in reach and not resolve(succ): return None
+            targets |= reach[succ]
+        targets.discard(start)
+        result[start] = targets
+    return result
+
 def generate_ar_lines(G: nx.DiGraph, siblings: list, parent_path: str, indent_level: int):
     """兄弟間の先行関係を計算して ar行を生成"""
     lines = []
-    valid_siblings_full = set()
-    for s in siblings:
-        full = f"{parent_path}/{s}".replace("//", "/")
-        valid_siblings_full.add(full)
+    # parent_path はスタック上のフルパス ('/' + ユニット名 の連結) のため '//' の置換は不要
+    start_nodes = [(s, f"{parent_path}/{s}") for s in siblings]
+    valid_siblings_full = {full for _, full in start_nodes}
         
     indent_str = "\t" * indent_level
+    bridged = _bridged_successor_map(G, valid_siblings_full, valid_siblings_full)
         
-    for s in siblings:
-        start_node = f"{parent_path}/{s}".replace("//", "/")
+    for s, start_node in start_nodes:
         if start_node not in G: continue
 
-        next_nodes_full = find_bridged_successors(G, start_node, valid_siblings_full)
+        if bridged is not None: next_nodes_full = bridged[start_node]
+        else: next_nodes_full = find_bridged_successors(G, start_node, valid_siblings_full)
         
-        for next_node in next_nodes_full:
-            next_name = os.path.basename(next_node)
+        for next_node in sorted(next_nodes_full):
+            next_name = next_node.rpartition('/')[2]
             lines.append(f"{indent_str}ar=(f={s},t={next_name},seq);")
             
     return lines
@@ -186,16 +256,25 @@ def build_hierarchy_map(need_set):
     h_map = collections.defaultdict(list)
     for path in need_set:
         if path == "/": continue
-        parent_dir = os.path.dirname(path)
-        basename = os.path.basename(path)
-        if parent_dir == "/": parent_dir = ""
+        # ★修正: os.path を通さず rpartition で親と名前を一度に分ける (AJSパスは常に '/' 区切り)
+        #        ルート直下 ('/X') は親が '' になる
+        head, _, basename = path.rpartition('/')
+        parent_dir = head.rstrip('/')
         h_map[parent_dir].append(basename)
     return h_map
 
-def pre_filter_definition(txt: str, need: set, G: nx.DiGraph = None):
-    """AJS定義から必要なユニットを抽出し、ar行のみ再構築する"""
-    out = []
-    stack = [] 
+def pre_filter_definition(fin, fout, need: set, G: nx.DiGraph = None):
+    """
+    AJS定義から必要なユニットを抽出し、ar行のみ再構築する
+    ★修正: 全文を保持せず、fin (行の反復) から読んだ行を fout へ逐次書き出す (行は '\n' 区切り・末尾改行なし)
+    """
+    first = True
+    def emit(line):
+        nonlocal first
+        if not first: fout.write('\n')
+        fout.write(line)
+        first = False
+    stack = []  # ★修正: (インデント, そのユニットまでの完全パス)。パスは親のパスに名前を足して作る
     skip = False
     sk_ind = None
     depth = 0
@@ -204,52 +283,51 @@ def pre_filter_definition(txt: str, need: set, G: nx.DiGraph = None):
     hierarchy_map = build_hierarchy_map(normalized_need)
     ar_written_map = {}
 
-    for ln in txt.splitlines():
+    for ln in fin:
+        ln = ln.rstrip('\n')
         st = ln.lstrip()
-        curr_indent = ln.count('\t')
 
+        # ★修正: インデント (タブ数) は使う行でだけ数える (読み飛ばし中は閉じ括弧の行のみ)
         if skip:
             depth += ln.count('{') - ln.count('}')
-            if st.startswith('}') and curr_indent == sk_ind and depth == 0:
+            if depth == 0 and st.startswith('}') and ln.count('\t') == sk_ind:
                 skip = False
                 while stack and stack[-1][0] >= sk_ind:
                     stack.pop()
             continue
         
         if st.startswith('unit='):
-            ind = curr_indent
+            ind = ln.count('\t')
             while stack and stack[-1][0] >= ind:
                 stack.pop()
             
             name = st.split('=', 1)[1].split(',', 1)[0].strip()
-            stack.append((ind, name))
-            path = '/' + '/'.join(n for _, n in stack)
+            path = f"{stack[-1][1] if stack else ''}/{name}"
+            stack.append((ind, path))
             
             if path not in normalized_need:
                 skip = True
                 sk_ind = ind
                 depth = 0
             else:
-                out.append(ln)
+                emit(ln)
             continue
         
         if st.startswith('ar='):
             if G is None:
-                out.append(ln)
+                emit(ln)
             else:
                 if stack:
-                    parent_path = '/' + '/'.join(n for _, n in stack)
+                    parent_path = stack[-1][1]
                     if not ar_written_map.get(parent_path):
                         children = hierarchy_map[parent_path]
                         if children:
-                            new_ars = generate_ar_lines(G, children, parent_path, curr_indent)
-                            out.extend(new_ars)
+                            for ar_line in generate_ar_lines(G, children, parent_path, ln.count('\t')):
+                                emit(ar_line)
                         ar_written_map[parent_path] = True
                 continue
 
-        out.append(ln)
-            
-    return '\n'.join(out)
+        emit(ln)
 
 def pre_start_job(gui_vars, gui_funcs, text_box):
     """先行関係解析のメイン処理"""
@@ -259,9 +337,10 @@ def pre_start_job(gui_vars, gui_funcs, text_box):
     show_info = gui_funcs['show_info']
     show_error = gui_funcs['show_error']
     
-    # ログ開始
-    with open(LOG_FILE_RUN, "w", encoding="utf-8") as f:
-        f.write(f"=== Tab 4 (Predecessor) Execution Start: {datetime.datetime.now()} ===\n")
+    global _LOG_FH
+    # ログ開始 (★修正: ジョブ終了までファイルを開いたままバッファ書き込み)
+    _LOG_FH = open(LOG_FILE_RUN, "w", encoding="utf-8", buffering=1 << 16)
+    _LOG_FH.write(f"=== Tab 4 (Predecessor) Execution Start: {datetime.datetime.now()} ===\n")
 
     v_root = gui_vars['v_pre_root']
     v_tgt = gui_vars['v_pre_tgt']
@@ -303,44 +382,49 @@ def pre_start_job(gui_vars, gui_funcs, text_box):
         srv_enc = ENC[v_srv_c.get()]
         
         with get_ssh_client() as ssh:
+            enlarge_sftp_window(ssh)
             sftp = ssh.open_sftp()
             update_status("SSH 接続...", 10)
             tmp_def, tmp_dep = f'/tmp/def_{ts}.txt', f'/tmp/dep_{ts}.txt'
             
-            update_status("ajsprint (1/2) 実行...", 25)
+            # ★修正: 2つの ajsprint を同時に実行開始し、(1/2) のダウンロード中も (2/2) はサーバー側で実行を続ける
             cmd1 = f'{env_str} && {ajs_print_path} -s yes -a {shlex.quote(ajs_root)} > {tmp_def}'
             _log(f"[Command-Def] {cmd1}")
-            
-            ch1 = ssh.get_transport().open_session()
-            ch1.exec_command(cmd1.encode(srv_enc))
-            if ch1.recv_exit_status() != 0:
-                err = ch1.makefile_stderr().read().decode(srv_enc, 'ignore')
-                _log(f"[Error] Def command failed: {err}")
-                raise RuntimeError(f"定義取得エラー:\n{err}")
-            
-            update_status("ajsprint (2/2) 実行...", 50)
             cmd2 = f'{env_str} && {ajs_print_path} -F AJSROOT1 -f %TY%t%JN%t%ar -R {shlex.quote(ajs_root)} > {tmp_dep}'
             _log(f"[Command-Rel] {cmd2}")
             
+            ch1 = ssh.get_transport().open_session()
+            ch1.exec_command(cmd1.encode(srv_enc))
             ch2 = ssh.get_transport().open_session()
             ch2.exec_command(cmd2.encode(srv_enc))
-            if ch2.recv_exit_status() != 0:
-                err = ch2.makefile_stderr().read().decode(srv_enc, 'ignore')
-                _log(f"[Error] Rel command failed: {err}")
-                raise RuntimeError(f"関連取得エラー:\n{err}")
             
-            update_status("ファイル取得...", 70)
             # ★修正: tmpフォルダに保存
             def_file = tmp_dir / 'ajs_definition_original.txt'
             dep_file = tmp_dir / 'ajs_graph.txt'
             
-            sftp.get(tmp_def, str(def_file))
-            sftp.get(tmp_dep, str(dep_file))
-            ssh.exec_command(f"rm -f {tmp_def} {tmp_dep}")
+            try:
+                update_status("ajsprint (1/2) 実行...", 25)
+                if ch1.recv_exit_status() != 0:
+                    err = ch1.makefile_stderr().read().decode(srv_enc, 'ignore')
+                    _log(f"[Error] Def command failed: {err}")
+                    raise RuntimeError(f"定義取得エラー:\n{err}")
+                update_status("ファイル取得 (1/2)...", 40)
+                sftp_download(sftp, tmp_def, def_file)
+                
+                update_status("ajsprint (2/2) 実行...", 55)
+                if ch2.recv_exit_status() != 0:
+                    err = ch2.makefile_stderr().read().decode(srv_enc, 'ignore')
+                    _log(f"[Error] Rel command failed: {err}")
+                    raise RuntimeError(f"関連取得エラー:\n{err}")
+                update_status("ファイル取得 (2/2)...", 70)
+                sftp_download(sftp, tmp_dep, dep_file)
+            finally:
+                ch1.close(); ch2.close()
+                try: ssh.exec_command(f"rm -f {tmp_def} {tmp_dep}")
+                except Exception: pass
             sftp.close()
             
         update_status("解析...", 80)
-        def_txt = def_file.read_text(encoding=srv_enc, errors='ignore')
         dep_txt = dep_file.read_text(encoding=srv_enc, errors='ignore')
         
         # グラフ構築
@@ -358,14 +442,19 @@ def pre_start_job(gui_vars, gui_funcs, text_box):
         })
         
         update_status("回復定義生成(再結線)...", 90)
-        rec_txt = pre_filter_definition(def_txt, need, G)
-        
-        # 成果物はルートへ
+        # 成果物はルートへ (★修正: 定義ファイルを読みながら直接書き出す)
         out_file = out_dir / 'recovery_definition.txt'
-        out_file.write_text(rec_txt, encoding=ENC[v_out_c.get()], newline=NL[v_out_n.get()])
+        with open(def_file, 'r', encoding=srv_enc, errors='ignore') as fin, \
+             open(out_file, 'w', encoding=ENC[v_out_c.get()], newline=NL[v_out_n.get()], buffering=1 << 20) as fout:
+            pre_filter_definition(fin, fout, need, G)
         
-        text_box.delete('1.0', 'end')
-        text_box.insert('end', '\n'.join(sorted(need)))
+        # ★修正: 件数が多い場合は先頭 RESULT_DISPLAY_MAX 件のみ表示 (全件は詳細ログに出力済み)
+        if len(need) > RESULT_DISPLAY_MAX:
+            shown = heapq.nsmallest(RESULT_DISPLAY_MAX, need)
+            body = '\n'.join(shown) + f"\n... 他 {len(need) - RESULT_DISPLAY_MAX} 件 (全件は {LOG_FILE_DETAIL.name} を参照)"
+        else:
+            body = '\n'.join(sorted(need))
+        gui_funcs['set_result_text'](text_box, body)
         
         update_status("完了", 100)
         save_hist()
@@ -378,3 +467,5 @@ def pre_start_job(gui_vars, gui_funcs, text_box):
         show_error(str(e))
     finally:
         update_status("待機中", 0)
+        _LOG_FH.close()
+        _LOG_FH = None